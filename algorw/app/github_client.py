@@ -0,0 +1,318 @@
+"""Cliente de la API de Github compartido por la aplicación y el corrector.
+
+PyGithub hace cada llamada a la API sin ningún tipo de caché, abriendo una
+conexión nueva por request, y no avisa cuando se está por agotar el límite
+de requests de la instalación (que es compartido por todos los procesos).
+Este módulo reemplaza la clase de conexión de PyGithub por una que:
+
+  - reutiliza una misma sesión HTTP (keep-alive) por proceso e hilo;
+
+  - guarda en Redis las respuestas a GET junto con su ETag, y las vuelve a
+    pedir con If-None-Match; las respuestas 304 no cuentan para el límite.
+    Las respuestas se comparten solo entre tokens de una misma instalación
+    (ver register_token());
+
+  - registra en Redis, compartido entre procesos, cuántas requests quedan
+    (X-RateLimit-Remaining), para que las tareas no urgentes, como la
+    sincronización con los repositorios de alumnes, se puedan postergar
+    antes de agotarlo (ver defer_delay());
+
+  - lleva la cuenta de requests, respuestas cacheadas y bytes transferidos.
+
+Para ver el estado actual:
+
+    python -m algorw.app.github_client
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional
+
+import github
+import requests
+
+from github.Requester import Requester
+
+from .queue import redis_conn
+
+
+__all__ = [
+    "RateLimit",
+    "budget",
+    "client",
+    "defer_delay",
+    "install",
+    "register_token",
+    "stats",
+]
+
+DEFAULT_API_URL = "https://api.github.com"
+
+# Las respuestas grandes (p.ej. árboles recursivos, que ya se cachean por
+# sha en AluRepo) no se guardan.
+MAX_CACHED_BODY = 512 * 1024
+ETAG_TTL = 24 * 3600
+
+STATS_KEY = "github:stats"
+
+# Actualiza el presupuesto solo si la respuesta es más reciente que la
+# guardada: con varios procesos, las respuestas llegan desordenadas.
+_UPDATE_RATELIMIT = """
+local reset = tonumber(redis.call('HGET', KEYS[1], 'reset') or '0')
+local remaining = tonumber(redis.call('HGET', KEYS[1], 'remaining') or '-1')
+local new_remaining, new_reset = tonumber(ARGV[1]), tonumber(ARGV[3])
+if new_reset > reset or (new_reset == reset and new_remaining < remaining) then
+  redis.call('HMSET', KEYS[1], 'remaining', ARGV[1], 'limit', ARGV[2],
+             'reset', ARGV[3])
+  redis.call('EXPIREAT', KEYS[1], new_reset)
+end
+"""
+_update_ratelimit = redis_conn.register_script(_UPDATE_RATELIMIT)
+
+
+class RateLimit(NamedTuple):
+    remaining: int
+    limit: int
+    reset: int
+
+
+def client(auth_token: str, api_url: str = DEFAULT_API_URL) -> github.Github:
+    """Devuelve un objeto Github que usa la conexión compartida."""
+    install()
+    return github.Github(auth_token, base_url=api_url)
+
+
+@lru_cache(maxsize=1)
+def install() -> None:
+    """Instala en PyGithub la clase de conexión de este módulo.
+
+    Afecta a todos los objetos Github (y GithubIntegration) que se creen
+    a continuación en el proceso.
+    """
+    Requester.injectConnectionClasses(_HTTPConnection, _HTTPSConnection)
+
+
+def budget(resource: str = "core") -> Optional[RateLimit]:
+    """Requests restantes de la instalación, según la última respuesta.
+
+    Returns:
+      None si no se conoce (o ya pasó el momento de reinicio).
+    """
+    values = redis_conn.hgetall(f"github:ratelimit:{resource}")
+    if not values:
+        return None
+    return RateLimit(*(int(values[k]) for k in (b"remaining", b"limit", b"reset")))
+
+
+def defer_delay(reserve: int, resource: str = "core") -> float:
+    """Segundos que postergar una tarea no urgente para no agotar el límite.
+
+    Args:
+      reserve: requests a reservar para las tareas urgentes; si quedan menos,
+          las no urgentes deben esperar al reinicio del límite.
+
+    Returns:
+      0 si hay presupuesto suficiente.
+    """
+    if (limit := budget(resource)) is None or limit.remaining >= reserve:
+        return 0
+    return max(limit.reset - time.time(), 0) + 1
+
+
+def register_token(token: str, owner: str, ttl: int) -> None:
+    """Registra a qué instalación (dueño) pertenece un token de instalación.
+
+    Las respuestas cacheadas de la API se comparten entre los tokens de un
+    mismo dueño, que se renuevan cada hora; las de cualquier otro token (no
+    registrado) solo se reutilizan con ese mismo token.
+    """
+    if ttl > 0:
+        redis_conn.set(f"github:token-owner:{_sha256(token)}", owner, ex=ttl)
+
+
+def stats() -> Dict[str, int]:
+    """Contadores acumulados de todos los procesos."""
+    return {k.decode(): int(v) for k, v in redis_conn.hgetall(STATS_KEY).items()}
+
+
+class _Response:
+    # Imita la respuesta de httplib, como github.Requester.RequestsResponse.
+    def __init__(self, status: int, headers: Dict[str, str], text: str):
+        self.status = status
+        self.headers = headers
+        self.text = text
+
+    def getheaders(self):
+        return self.headers.items()
+
+    def read(self):
+        return self.text
+
+
+class _HTTPSConnection:
+    # Imita la conexión de httplib, como github.Requester.HTTPSRequestsConnectionClass.
+    protocol = "https"
+    default_port = 443
+
+    def __init__(
+        self,
+        host,
+        port=None,
+        strict=False,
+        timeout=None,
+        retry=None,
+        pool_size=None,
+        **kwargs,
+    ):
+        self.host = host
+        self.port = port or self.default_port
+        self.timeout = timeout
+        self.verify = kwargs.get("verify", True)
+        self.session = _session(
+            os.getpid(), threading.get_ident(), self.protocol, retry, pool_size
+        )
+
+    def request(self, verb, url, input, headers):
+        self.verb = verb
+        self.url = url
+        self.input = input
+        self.headers = headers
+
+    def getresponse(self):
+        cache_key = cached = None
+        if self.verb == "GET":
+            cache_key = _cache_key(self.url, self.headers)
+            if cached := redis_conn.hgetall(cache_key):
+                etag = cached[b"etag"].decode()
+                self.headers = {**self.headers, "If-None-Match": etag}
+
+        r = self.session.request(
+            self.verb,
+            f"{self.protocol}://{self.host}:{self.port}{self.url}",
+            headers=self.headers,
+            data=self.input,
+            timeout=self.timeout,
+            verify=self.verify,
+            allow_redirects=False,
+        )
+        headers = {k.lower(): v for k, v in r.headers.items()}
+        _record(r, headers, self.input)
+
+        if r.status_code == 304 and cached:
+            # Se devuelve la respuesta guardada, con los headers nuevos (en
+            # particular, los del límite de requests).
+            redis_conn.hincrby(STATS_KEY, "not_modified")
+            headers = {**json.loads(cached[b"headers"]), **headers}
+            return _Response(200, headers, cached[b"body"].decode("utf-8"))
+
+        if (
+            cache_key is not None
+            and r.status_code == 200
+            and "etag" in headers
+            and len(r.content) <= MAX_CACHED_BODY
+        ):
+            fields = {"etag": headers["etag"], "body": r.text}
+            fields["headers"] = json.dumps(headers)
+            with redis_conn.pipeline() as pipe:
+                pipe.hset(cache_key, mapping=fields)
+                pipe.expire(cache_key, ETAG_TTL)
+                pipe.execute()
+
+        return _Response(r.status_code, headers, r.text)
+
+    def close(self):
+        return
+
+
+class _HTTPConnection(_HTTPSConnection):
+    # Solo para servidores locales (ver scripts/fake_github.py).
+    protocol = "http"
+    default_port = 80
+
+
+@lru_cache(maxsize=None)
+def _session(
+    pid: int, thread: int, protocol: str, retry, pool_size
+) -> requests.Session:
+    # La sesión es por proceso (pid), para no compartir sockets tras un fork();
+    # y por hilo, porque requests.Session no es thread-safe (los clientes de
+    # PyGithub son independientes, pero todos usan esta sesión).
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        max_retries=requests.adapters.DEFAULT_RETRIES if retry is None else retry,
+        pool_connections=pool_size or requests.adapters.DEFAULT_POOLSIZE,
+        pool_maxsize=pool_size or requests.adapters.DEFAULT_POOLSIZE,
+    )
+    session.mount(f"{protocol}://", adapter)
+    return session
+
+
+def _cache_key(url: str, headers: Dict[str, str]) -> str:
+    # No se usa el header Authorization tal cual, porque los tokens de
+    # instalación se renuevan cada hora: se usa el dueño de la instalación.
+    identity = _identity(headers.get("Authorization", ""))
+    return "github:etag:" + _sha256(f"{identity}\n{url}\n{headers.get('Accept', '')}")
+
+
+@lru_cache(maxsize=256)
+def _identity(authorization: str) -> str:
+    # Un token no cambia de dueño, así que basta consultarlo una vez. Los
+    # tokens se registran al pedirlos a Github, antes de su primer uso.
+    token = authorization.split(" ", 1)[-1]
+    if (owner := redis_conn.get(f"github:token-owner:{_sha256(token)}")) is not None:
+        return "owner:" + owner.decode("utf-8")
+    return "token:" + _sha256(authorization)
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _record(r: requests.Response, headers: Dict[str, str], input) -> None:
+    if isinstance(input, str):
+        input = input.encode("utf-8")
+    sent = len(input) if isinstance(input, bytes) else 0
+    with redis_conn.pipeline(transaction=False) as pipe:
+        pipe.hincrby(STATS_KEY, "requests")
+        pipe.hincrby(STATS_KEY, "bytes_out", sent)
+        pipe.hincrby(STATS_KEY, "bytes_in", len(r.content))
+        pipe.execute()
+
+    if "x-ratelimit-remaining" in headers and "x-ratelimit-reset" in headers:
+        resource = headers.get("x-ratelimit-resource", "core")
+        _update_ratelimit(
+            keys=[f"github:ratelimit:{resource}"],
+            args=[
+                headers["x-ratelimit-remaining"],
+                headers.get("x-ratelimit-limit", 0),
+                headers["x-ratelimit-reset"],
+            ],
+        )
+
+
+def main():
+    counters = stats()
+    if (total := counters.get("requests", 0)) > 0:
+        hits = counters.get("not_modified", 0)
+        print(f"requests: {total}, cacheadas (304): {hits} ({100 * hits / total:.1f}%)")
+        print(
+            f"recibidos: {counters.get('bytes_in', 0) / 2**20:.1f} MiB, "
+            f"enviados: {counters.get('bytes_out', 0) / 2**20:.1f} MiB"
+        )
+    if (limit := budget()) is not None:
+        minutes = (limit.reset - time.time()) / 60
+        print(
+            f"límite: quedan {limit.remaining} de {limit.limit} requests "
+            f"(se reinicia en {minutes:.0f} min)"
+        )
+    else:
+        print("límite: sin datos recientes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Caché compartido de tokens de instalación de la Github App.
+
+Los tokens de instalación duran una hora y, en la práctica, son siempre
+para la misma organización. En lugar de pedir uno nuevo en cada entrega
+(lo que implicaba leer la clave privada y hacer dos o tres llamadas a la
+API de Github por entrega), se guardan en Redis, compartidos entre todos
+los procesos, y se renuevan poco antes de que expiren.
+
+Los tokens se piden en el momento de usarlos (p.ej. en el corrector, al
+sincronizar), nunca al encolar un job: el job podría esperar en la cola más
+de lo que dura el token.
+
+La renovación se hace con un lock de Redis, de modo que si varios procesos
+encuentran el token expirado a la vez, solo uno de ellos lo pide a Github.
+"""
+
+import time
+
+from calendar import timegm
+from functools import lru_cache
+
+import github
+
+from config import load_config
+
+from ..common.models import Repo
+from . import github_client
+from .queue import redis_conn
+
+
+__all__ = [
+    "installation_token",
+]
+
+cfg = load_config()
+
+# Los tokens se dejan de entregar con este margen antes de su expiración, para
+# que una sincronización en curso (AluRepo.sync) no se quede sin autenticación.
+TOKEN_MARGIN = 15 * 60
+
+# El ID de instalación no cambia salvo que se reinstale la aplicación.
+INSTALLATION_TTL = 24 * 3600
+
+
+def installation_token(repo: Repo) -> str:
+    """Devuelve un token de instalación válido para el dueño de `repo`."""
+    key = f"github:token:{repo.owner}"
+
+    if (token := redis_conn.get(key)) is not None:
+        return token.decode("utf-8")
+
+    with redis_conn.lock(f"{key}:lock", timeout=60, blocking_timeout=60):
+        # Otro proceso pudo haberlo renovado mientras esperábamos el lock.
+        if (token := redis_conn.get(key)) is not None:
+            return token.decode("utf-8")
+
+        gh = _integration()
+        auth = gh.get_access_token(_installation_id(gh, repo))
+        expires = timegm(auth.expires_at.utctimetuple())
+        github_client.register_token(auth.token, repo.owner, int(expires - time.time()))
+        ttl = int(expires - time.time() - TOKEN_MARGIN)
+        if ttl > 0:
+            redis_conn.set(key, auth.token, ex=ttl)
+        return auth.token
+
+
+def _installation_id(gh: github.GithubIntegration, repo: Repo) -> int:
+    """ID de la instalación correspondiente a un repositorio (cacheado en Redis)."""
+    key = f"github:installation:{repo.owner}"
+
+    if (inst_id := redis_conn.get(key)) is not None:
+        return int(inst_id)
+
+    try:
+        installation = gh.get_repo_installation(repo.owner, repo.name)
+    except github.UnknownObjectException:
+        installation = gh.get_org_installation(repo.owner)
+
+    redis_conn.set(key, installation.id, ex=INSTALLATION_TTL)
+    return installation.id
+
+
+def _integration() -> github.GithubIntegration:
+    # Crear este objeto cada vez (solo al renovar el token) para evitar
+    # https://github.com/PyGithub/PyGithub/issues/2431.
+    github_client.install()
+    return github.GithubIntegration(cfg.github_app_id, _private_key())
+
+
+@lru_cache(maxsize=1)
+def _private_key() -> str:
+    with open(cfg.github_app_keyfile) as keyfile:
+        return keyfile.read()
@@ -0,0 +1,184 @@
+"""Cola de salida (“outbox”) para los correos del sistema de entregas.
+
+Enviar un correo implica abrir una conexión a smtp.gmail.com, negociar
+STARTTLS, autenticar con XOAUTH2 y subir el adjunto; hacerlo dentro de
+POST / retenía un thread de uWSGI varios segundos por entrega. Ahora la
+aplicación web (y también el corrector, al responder) solo encola el
+mensaje en Redis, y un worker dedicado (ver entregas.ini) lo envía sobre
+una sesión SMTP persistente, reintentando con backoff si falla.
+
+El estado de cada envío queda en rq: el ID del job es el Message-ID del
+correo, y los envíos que agotan los reintentos quedan en la FailedJobRegistry
+de la cola (`rq info` los muestra). Los reintentos los encola el scheduler de
+rq, por lo que el worker se debe lanzar con `--with-scheduler`.
+
+El ZIP de la entrega no viaja por Redis dentro del mensaje: se encola solo
+su digest, y el worker lo adjunta desde el BlobStore al enviar.
+
+En las noches de entrega se acumulan mensajes en la cola: cada job, además
+de su propio mensaje, toma de la cola hasta MAX_BATCH - 1 mensajes pendientes
+y los envía todos juntos sobre la misma sesión SMTP (ver SMTPSender.send_many).
+Los jobs tomados así se marcan como terminados; si su mensaje no se pudo
+enviar, se los vuelve a encolar, y se reintentan por su cuenta.
+"""
+
+import copy
+import logging
+
+from email import encoders
+from email.message import Message
+from email.mime.base import MIMEBase
+from typing import List, NamedTuple, Optional
+
+from google.oauth2.credentials import Credentials  # type: ignore
+from rq import Queue, Retry, get_current_job  # type: ignore
+from rq.job import Job, JobStatus  # type: ignore
+from rq.registry import FinishedJobRegistry  # type: ignore
+from rq.utils import utcnow  # type: ignore
+
+from config import load_config
+
+from .. import utils
+from ..common.blobs import FAILURE_TTL
+from .queue import blob_store, mail_queue
+
+
+__all__ = [
+    "Attachment",
+    "deliver",
+    "enqueue",
+]
+
+cfg = load_config()
+logger = logging.getLogger("entregas")
+
+# Reintentos ante errores de SMTP u OAuth: el último ocurre ~20 minutos
+# después del primer intento.
+RETRY_INTERVALS = [10, 30, 60, 300, 900]
+
+# Mensajes a enviar, como máximo, sobre una misma sesión SMTP en un job.
+MAX_BATCH = 20
+
+# Tiempo que se conserva el resultado de los jobs (el default de rq).
+RESULT_TTL = 500
+
+_creds: Optional[Credentials] = None
+
+
+class Attachment(NamedTuple):
+    """Un archivo ZIP del BlobStore, a adjuntar al enviar el mensaje."""
+
+    digest: str
+    filename: str
+
+
+def enqueue(message: Message, attachment: Optional[Attachment] = None) -> Job:
+    """Encola un mensaje para su envío desde el worker de correo.
+
+    Si se especifica `attachment`, el llamador le cede una referencia en el
+    BlobStore, que se libera una vez enviado el mensaje.
+    """
+    return mail_queue.enqueue(
+        deliver,
+        message,
+        attachment,
+        job_id=message["Message-ID"].strip("<>"),
+        description=message["Subject"],
+        retry=Retry(max=len(RETRY_INTERVALS), interval=RETRY_INTERVALS),
+        failure_ttl=FAILURE_TTL,
+    )
+
+
+def deliver(message: Message, attachment: Optional[Attachment] = None) -> str:
+    """Envía un mensaje de la cola (se ejecuta en el worker de correo).
+
+    Junto con el mensaje se envían, sobre la misma sesión SMTP, los mensajes
+    pendientes en la cola (ver MAX_BATCH).
+
+    Returns:
+      el Message-ID del correo enviado, que rq guarda como resultado del job.
+    """
+    job = get_current_job()
+    queue = Queue(job.origin, connection=job.connection) if job else mail_queue
+    claimed = _claim_pending(queue, MAX_BATCH - 1)
+    batch = [(message, attachment)] + [(j.args[0], j.args[1]) for j in claimed]
+
+    try:
+        errors = _sender.send_many(_with_attachment(m, a) for m, a in batch)
+    except Exception:
+        # Error de conexión o de autenticación: los mensajes tomados de la
+        # cola vuelven a ella, y este job se reintenta.
+        for pending in claimed:
+            queue.enqueue_job(pending)
+        raise
+
+    for (sent, sent_attachment), error in zip(batch, errors):
+        if error is None:
+            logger.info("Enviado %s a %s", sent["Message-ID"], sent["To"])
+            # Solo tras un envío exitoso: los reintentos necesitan el archivo.
+            if sent_attachment is not None:
+                blob_store.release(sent_attachment.digest)
+
+    for pending, error in zip(claimed, errors[1:]):
+        if error is None:
+            _finish(pending, pending.args[0]["Message-ID"])
+        else:
+            logger.warning("No se pudo enviar %s: %s", pending.id, error)
+            queue.enqueue_job(pending)
+
+    if errors[0] is not None:
+        raise errors[0]
+    return message["Message-ID"]
+
+
+def _with_attachment(message: Message, attachment: Optional[Attachment]) -> Message:
+    # Se adjunta sobre una copia: el mensaje original vuelve a la cola si falla.
+    if attachment is not None:
+        message = copy.deepcopy(message)
+        with blob_store.open(attachment.digest) as data:
+            part = MIMEBase("application", "zip")
+            part.set_payload(data[:])
+        encoders.encode_base64(part)
+        filename = attachment.filename
+        part.add_header("Content-Disposition", "attachment", filename=filename)
+        message.attach(part)
+    return message
+
+
+def _claim_pending(queue: Queue, limit: int) -> List[Job]:
+    """Toma de la cola hasta `limit` jobs pendientes, para enviarlos en lote."""
+    claimed = []
+    for job_id in queue.get_job_ids(0, limit) if limit > 0 else []:
+        # Si otro worker ya tomó el job, LREM no lo encuentra y devuelve 0.
+        if queue.remove(job_id) and (job := queue.fetch_job(job_id)) is not None:
+            claimed.append(job)
+    return claimed
+
+
+def _finish(job: Job, result: str) -> None:
+    """Marca como terminado un job enviado como parte del lote de otro."""
+    job._result = result
+    job.ended_at = utcnow()
+    with job.connection.pipeline() as pipe:
+        job.set_status(JobStatus.FINISHED, pipeline=pipe)
+        job.save(pipeline=pipe, include_meta=False)
+        job.cleanup(RESULT_TTL, pipeline=pipe, remove_from_queue=False)
+        registry = FinishedJobRegistry(job.origin, connection=job.connection)
+        registry.add(job, RESULT_TTL, pipeline=pipe)
+        pipe.execute()
+
+
+def oauth_credentials() -> Credentials:
+    """Caché de las credenciales OAuth del worker de correo."""
+    global _creds
+
+    if _creds is None or not _creds.valid:
+        _creds = utils.get_oauth_credentials(cfg)
+
+    return _creds
+
+
+# Sesión SMTP persistente del worker. Para que sobreviva entre jobs, el worker
+# se debe lanzar con `-w rq.worker.SimpleWorker` (el Worker normal hace fork
+# por cada job, y se volvería a conectar y autenticar en cada envío).
+_sender = utils.SMTPSender(oauth_credentials)
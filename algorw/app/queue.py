@@ -3,7 +3,28 @@ from rq import Queue  # type: ignore
 
 from config import load_config
 
+from ..common.blobs import BlobStore
+
 
 settings = load_config()
 redis_conn = Redis()
 task_queue = Queue(settings.job_queue, connection=redis_conn)
+mail_queue = Queue(settings.mail_queue, connection=redis_conn)
+
+# Cola para ausencias y parcialitos, que no deben esperar detrás de los TPs.
+light_queue = Queue(settings.light_queue, connection=redis_conn)
+
+# Las entregas se guardan aquí, y por la cola viaja solamente su digest.
+blob_store = BlobStore(settings.blob_dir, redis_conn)
+
+
+def correction_queue(tp_id: str) -> Queue:
+    """Cola en que encolar la corrección de un TP.
+
+    Los TPs con límite de correcciones simultáneas (Settings.tp_slots) tienen
+    su propia cola, que atiende solo esa cantidad de workers del supervisor
+    (ver algorw/corrector/pool.py).
+    """
+    if tp_id in settings.tp_slots:
+        return Queue(f"{settings.job_queue}_{tp_id}", connection=redis_conn)
+    return task_queue
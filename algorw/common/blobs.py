@@ -0,0 +1,131 @@
+"""Almacén local de archivos direccionado por contenido.
+
+Las entregas se guardan una sola vez en disco, con su digest SHA-256 como
+nombre, y por la cola de rq viaja solamente el digest. Así Redis no crece
+con la profundidad de la cola, y las re-entregas idénticas comparten el
+mismo archivo.
+
+Los archivos llevan un contador de referencias (en Redis): put() lo
+incrementa, y release() lo decrementa y borra el archivo al llegar a cero.
+
+Un job que falla de manera inesperada (o un worker que muere) no llama a
+release(), para que el job se pueda reencolar desde la FailedJobRegistry de
+rq. Por eso gc() borra no solo los archivos sin referencias, sino también,
+pasado MAX_AGE, los que aún tienen referencias: para entonces rq ya descartó
+los jobs fallidos que los usaban (ver FAILURE_TTL).
+"""
+
+import hashlib
+import mmap
+import os
+import pathlib
+import tempfile
+import time
+
+from redis import Redis
+
+
+__all__ = [
+    "BlobStore",
+    "FAILURE_TTL",
+]
+
+# Tiempo que rq conserva los jobs fallidos que referencian archivos (se debe
+# pasar como failure_ttl al encolarlos), y antigüedad a partir de la cual
+# gc() borra un archivo aunque tenga referencias.
+FAILURE_TTL = 7 * 24 * 3600
+MAX_AGE = FAILURE_TTL + 24 * 3600
+
+
+class BlobStore:
+    """Almacén de archivos en `root`, con referencias contadas en Redis."""
+
+    def __init__(self, root: pathlib.Path, redis_conn: Redis):
+        self._root = pathlib.Path(root)
+        self._redis = redis_conn
+
+    def put(self, data: bytes) -> str:
+        """Guarda un archivo (si no existía) y devuelve su digest.
+
+        Cada llamada a put() suma una referencia, y debe tener su
+        correspondiente release().
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+
+        with self._lock(digest):
+            if path.exists():
+                os.utime(path)
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmpname = tempfile.mkstemp(dir=path.parent)
+                with os.fdopen(fd, "wb") as tmp:
+                    tmp.write(data)
+                os.replace(tmpname, path)
+            self._redis.hincrby(self._refs_key, digest, 1)
+
+        return digest
+
+    def open(self, digest: str) -> mmap.mmap:
+        """Devuelve los contenidos de un archivo, mapeados en memoria.
+
+        El objeto devuelto se puede usar como archivo (p.ej. con ZipFile) y
+        como context manager.
+        """
+        with open(self.path(digest), "rb") as blob:
+            return _MappedFile(blob.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def release(self, digest: str) -> None:
+        """Quita una referencia a un archivo; si era la última, se lo borra."""
+        with self._lock(digest):
+            if self._redis.hincrby(self._refs_key, digest, -1) <= 0:
+                self._redis.hdel(self._refs_key, digest)
+                self.path(digest).unlink(missing_ok=True)
+
+    def gc(self, grace: int = 24 * 3600, max_age: int = MAX_AGE) -> int:
+        """Borra archivos viejos que ya no se usan.
+
+        Se borran los archivos sin referencias modificados hace más de `grace`
+        segundos, y los archivos con referencias modificados hace más de
+        `max_age` segundos (put() actualiza la fecha de modificación).
+
+        Returns:
+          el número de archivos borrados.
+        """
+        removed = 0
+        now = time.time()
+
+        for path in self._root.glob("??/*"):
+            if len(path.name) != 64 or (age := now - path.stat().st_mtime) <= grace:
+                continue
+            with self._lock(path.name):
+                if age > max_age:
+                    self._redis.hdel(self._refs_key, path.name)
+                elif self._redis.hexists(self._refs_key, path.name):
+                    continue
+                path.unlink(missing_ok=True)
+                removed += 1
+
+        return removed
+
+    def path(self, digest: str) -> pathlib.Path:
+        return self._root / digest[:2] / digest
+
+    @property
+    def _refs_key(self) -> str:
+        return f"blobs:refs:{self._root.resolve()}"
+
+    def _lock(self, digest: str):
+        return self._redis.lock(f"blobs:lock:{digest}", timeout=60)
+
+
+class _MappedFile(mmap.mmap):
+    # ZipFile requiere seekable(), que mmap no implementa antes de Python 3.13.
+    def seekable(self) -> bool:
+        return True
+
+
+if __name__ == "__main__":
+    from ..app.queue import blob_store
+
+    print(f"{blob_store.gc()} archivos viejos borrados")
@@ -6,18 +6,21 @@ from pydantic import BaseModel
 from .models import Repo
 
 
+# Headers del correo original que necesita el corrector.
+REPLY_HEADERS = ("Subject", "Date", "To", "Cc", "Reply-To", "Message-ID")
+
+
 class RepoSync(BaseModel):
     """Clase que describe la sincronización de una entrega."""
 
     # El repositorio donde se sincroniza la entrega.
     alu_repo: Repo
 
-    # El nombre de cuenta de Github que realizó la entrega.
+    # El nombre de cuenta de Github que realizó la entrega. (El token de la
+    # instalación de Github no viaja en la tarea: lo obtiene el corrector al
+    # sincronizar, ver algorw/app/github_tokens.py.)
     github_id: str
 
-    # El token para autenticar la instalación de Github.
-    auth_token: str
-
     class Config:
         arbitrary_types_allowed = True
 
@@ -34,12 +37,16 @@ class CorrectorTask(BaseModel):
     # "tp_id es el ID del TP; suele ir en minúsculas, y se usa como nombre
     # de directorio en skel.
     tp_id: str
-    zipfile: bytes
     legajos: List[str]
 
+    # Digest SHA-256 del archivo ZIP de la entrega, guardado en el BlobStore
+    # de la aplicación (ver algorw/common/blobs.py).
+    zip_digest: str
+
     # "orig_headers" son los headers del correo original que envió el sistema
-    # de entregas. TODO: eliminar de corrector.py toda la lógica que trata la
-    # entrada como un correo.
+    # de entregas (solo los que se usan para responder, ver REPLY_HEADERS).
+    # TODO: eliminar de corrector.py toda la lógica que trata la entrada como
+    # un correo.
     orig_headers: Dict[str, str]
 
     # Ubicación de la entrega en el repo de entregas. A día de hoy el sistema
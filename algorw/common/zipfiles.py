@@ -0,0 +1,182 @@
+"""Reglas de validación de los archivos ZIP de las entregas.
+
+Estas reglas se aplican tanto en la página de entregas (para rechazar una
+entrega inválida antes de encolarla) como en el corrector (zip_walk).
+
+Además de los nombres, se limitan la cantidad de archivos y su tamaño una
+vez descomprimidos, para que un “ZIP bomb” no pueda agotar la memoria de un
+worker. Los límites se verifican sobre el directorio central del ZIP, y de
+nuevo al descomprimir (ver read_member), por si los tamaños declarados no
+fueran ciertos.
+"""
+
+import zipfile
+
+from pathlib import PurePath
+from typing import Iterator, Tuple
+
+
+__all__ = [
+    "FORBIDDEN_DIRECTORIES",
+    "FORBIDDEN_EXTENSIONS",
+    "InvalidZip",
+    "check_zip",
+    "is_forbidden",
+    "is_skippable",
+    "read_member",
+    "walk",
+]
+
+
+# Archivos que no aceptamos en las entregas.
+FORBIDDEN_EXTENSIONS = {
+    ".o",
+    ".class",
+    ".jar",
+    ".pyc",
+}
+
+FORBIDDEN_DIRECTORIES = {
+    ".git",
+}
+
+# Archivos que se ignoran silenciosamente.
+SKIPPABLE_NAMES = {
+    ".git",
+    ".DS_Store",
+    "__MACOSX",
+}
+
+
+# Límites para el contenido de un ZIP.
+MAX_ENTRIES = 1000
+MAX_FILE_SIZE = 8 * 1024 * 1024
+MAX_TOTAL_SIZE = 32 * 1024 * 1024
+
+# Tasa de compresión máxima, solo para archivos de más de MIN_RATIO_SIZE
+# (los archivos pequeños de texto pueden comprimirse mucho legítimamente).
+MAX_RATIO = 100
+MIN_RATIO_SIZE = 1024 * 1024
+
+MiB = 1024 * 1024
+
+
+Entry = Tuple[PurePath, zipfile.ZipInfo]
+
+
+class InvalidZip(Exception):
+    """Excepción para un ZIP que no cumple las reglas de las entregas."""
+
+
+def is_forbidden(path: PurePath) -> bool:
+    return (
+        path.is_absolute()
+        or ".." in path.parts
+        or path.suffix in FORBIDDEN_EXTENSIONS
+        or any(p in FORBIDDEN_DIRECTORIES for p in path.parts)
+    )
+
+
+def is_skippable(path: PurePath) -> bool:
+    return any(p in SKIPPABLE_NAMES for p in path.parts)
+
+
+def check_zip(zip_obj: zipfile.ZipFile) -> None:
+    """Valida, en una sola pasada por el directorio central, un archivo ZIP.
+
+    No se descomprime ningún archivo: solo se examinan los nombres y los
+    tamaños declarados.
+
+    Raises:
+      InvalidZip si el ZIP no contiene archivos, contiene archivos prohibidos,
+      o supera los límites de cantidad o tamaño.
+    """
+    infolist = zip_obj.infolist()
+    num_files = total_size = 0
+    forbidden_files = []
+
+    if len(infolist) > MAX_ENTRIES:
+        raise InvalidZip(f"el ZIP contiene más de {MAX_ENTRIES} archivos")
+
+    for info in infolist:
+        path = PurePath(info.filename)
+        if is_skippable(path):
+            continue
+        if is_forbidden(path):
+            forbidden_files.append(path)
+        elif not info.is_dir():
+            num_files += 1
+            total_size += info.file_size
+            _check_size(info)
+
+    if total_size > MAX_TOTAL_SIZE:
+        max_mib = MAX_TOTAL_SIZE // MiB
+        raise InvalidZip(f"el ZIP descomprimido ocupa más de {max_mib} MiB")
+
+    if forbidden_files:
+        raise InvalidZip(
+            "no se permiten archivos con estas extensiones:\n\n  • "
+            + "\n  • ".join(f.name for f in forbidden_files)
+        )
+
+    if not num_files:
+        raise InvalidZip("archivo ZIP vacío")
+
+
+def walk(zip_obj: zipfile.ZipFile, strip_toplevel=True) -> Iterator[Entry]:
+    """Valida un ZIP e itera sobre sus archivos, en una sola pasada.
+
+    Se omiten los directorios y los archivos ignorables (ver is_skippable).
+    Si strip_toplevel, y todas las entradas están en un mismo directorio, se
+    quita ese directorio de las rutas.
+
+    Yields:
+      tuplas (ruta, ZipInfo).
+
+    Raises:
+      InvalidZip si el ZIP no pasa check_zip().
+    """
+    check_zip(zip_obj)
+
+    entries = []
+    toplevel = set()
+    num_entries = 0
+
+    for info in zip_obj.infolist():
+        path = PurePath(info.filename)
+        if is_skippable(path):
+            continue
+        num_entries += 1
+        toplevel.add(path.parts[0])
+        if not info.is_dir():
+            entries.append((path, info))
+
+    common_parent = "."
+    if strip_toplevel and num_entries > 1 and len(toplevel) == 1:
+        common_parent = toplevel.pop()
+
+    for path, info in entries:
+        yield path.relative_to(common_parent), info
+
+
+def read_member(zip_obj: zipfile.ZipFile, info: zipfile.ZipInfo) -> bytes:
+    """Descomprime un archivo, sin leer más que su tamaño declarado.
+
+    Raises:
+      InvalidZip si el contenido supera el tamaño declarado en el ZIP.
+    """
+    with zip_obj.open(info) as member:
+        data = member.read(info.file_size + 1)
+    if len(data) > info.file_size:
+        raise InvalidZip(f"{info.filename}: tamaño declarado incorrecto")
+    return data
+
+
+def _check_size(info: zipfile.ZipInfo) -> None:
+    if info.file_size > MAX_FILE_SIZE:
+        raise InvalidZip(f"{info.filename} ocupa más de {MAX_FILE_SIZE // MiB} MiB")
+    if (
+        info.file_size > MIN_RATIO_SIZE
+        and info.file_size > MAX_RATIO * max(info.compress_size, 1)
+    ):
+        raise InvalidZip(f"{info.filename}: tasa de compresión sospechosa")
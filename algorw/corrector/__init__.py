@@ -1,6 +1,20 @@
-from .corrector import corregir_entrega
+"""Corrección de entregas (ver algorw/corrector/corrector.py).
 
+El módulo corrector lee su configuración de las variables de entorno
+CORRECTOR_* (y se conecta a Redis) al importarse. Para que los módulos del
+paquete (p.ej. moss o capture, y los scripts que los usan) se puedan
+importar sin esa configuración, sus nombres se importan recién al usarlos.
+"""
 
 __all__ = [
+    "JOB_TIMEOUT",
     "corregir_entrega",
 ]
+
+
+def __getattr__(name):
+    if name in __all__:
+        from . import corrector
+
+        return getattr(corrector, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,56 +1,96 @@
 """Clase AluRepo para manejar los repositorios individuales y grupales."""
 
 import base64
+import collections
+import fcntl
 import io
+import json
+import os
 import pathlib
 import re
+import shutil
 import tempfile
+import time
 
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Set
+from typing import Counter, Dict, List, Optional, Set, Tuple
 
 import git  # type: ignore
 import github
 
 from git.objects.fun import traverse_tree_recursive  # type: ignore
 from git.util import stream_copy  # type: ignore
+from gitdb.util import bin_to_hex, hex_to_bin  # type: ignore
 from github import InputGitTreeElement
-from github.GitTree import GitTree as GithubTree
+from github.GitRef import GitRef
 from github.Repository import Repository as GithubRepo
 
+from ..app import github_client
+from ..app.queue import redis_conn
+
 
 # Se saca el emoji de la sincronización porque ya hay checkruns que indican el resultado
 EMOJI_REGEX = re.compile("^:(heavy_check_mark|x): ")
 
+# Los árboles de Git son inmutables, así que su listado se puede guardar en
+# Redis indefinidamente (el TTL es solo para no acumular basura).
+TREE_CACHE_TTL = 7 * 24 * 3600
+
+# Listado de un árbol: ruta → (tipo, sha).
+TreeListing = Dict[str, List[str]]
+
+# Cada cuánto se actualiza, como máximo, la copia local de un esqueleto.
+MIRROR_MAX_AGE = 10 * 60
+
 
 class AluRepo:
     """Clase para sincronizar un repo de alumne."""
 
-    def __init__(self, repo_full: str, *, auth_token: str):
+    def __init__(
+        self,
+        repo_full: str,
+        *,
+        auth_token: str,
+        api_url: str = github_client.DEFAULT_API_URL,
+    ):
         self.gh_repo: Optional[GithubRepo] = None  # TODO: Make this a @property.
         self.repo_full = repo_full
         self.auth_token = auth_token
+        self.api_url = api_url
+
+        # Llamadas a la API, y entradas de árboles descargadas, por sync().
+        self.stats: Counter[str] = collections.Counter()
 
     @property
     def url(self):
         return f"https://github.com/{self.repo_full}"
 
-    def ensure_exists(self, *, skel_repo: Optional[str] = None) -> None:
+    def ensure_exists(
+        self,
+        *,
+        skel_repo: Optional[str] = None,
+        mirror_dir: Optional[pathlib.Path] = None,
+    ) -> bool:
         """Crea el repositorio en Github, si no existe aún.
 
         Si el repositorio ya existe, no se hace nada. Si no existe, se lo
-        crea y se le inicializa con los contenidos de `skel_repo`.
+        crea y se le inicializa con los contenidos de `skel_repo`; si se
+        especifica `mirror_dir`, desde una copia local del esqueleto que se
+        mantiene allí (ver SkelMirror), en lugar de clonarlo cada vez.
+
+        Returns:
+          True si se creó el repositorio, False si ya existía.
 
         Raises:
           github.GithubException si no se pudo crear el repositorio.
         """
-        gh = github.Github(self.auth_token)
+        gh = github_client.client(self.auth_token, self.api_url)
         try:
-            self.gh_repo = gh.get_repo(self.repo_full)
+            self.gh_repo = self._api("get_repo", gh.get_repo, self.repo_full)
         except github.UnknownObjectException:
             pass
         else:
-            return
+            return False
 
         owner, name = self.repo_full.split("/", 1)
         organization = gh.get_organization(owner)
@@ -68,7 +108,11 @@ class AluRepo:
         )
 
         # Hacer push de todas las ramas del esqueleto.
-        if skel_repo is not None:
+        if skel_repo is not None and mirror_dir is not None:
+            mirror = SkelMirror(skel_repo, mirror_dir)
+            mirror.update()
+            mirror.push_to(self.repo_full)
+        elif skel_repo is not None:
             skel_repo = f"git@github.com:{skel_repo}"
             repo_full = f"git@github.com:{self.repo_full}"
             with tempfile.TemporaryDirectory() as tmpdir:
@@ -87,6 +131,7 @@ class AluRepo:
 
         # TODO: configure branch protections (necesario para cuando se dé permiso para
         # hacer push de manera directa para las entregas, desde Git).
+        return True
 
     def sync(
         self,
@@ -96,6 +141,7 @@ class AluRepo:
         checkrun: Optional[Dict] = None,
         *,
         target_subdir: Optional[str] = None,
+        squash: bool = False,
     ) -> None:
         """Importa una entrega a los repositorios de alumnes.
 
@@ -108,6 +154,8 @@ class AluRepo:
               vacía para actualizar el toplevel).
           checkrun: resultado de la corrección en formato CheckRun de Github, a
               ser asociado con el último commit.
+          squash: si hay varias entregas pendientes de sincronizar, crear un
+              único commit con la última, en lugar de un commit por entrega.
 
         Raises:
           github.UnknownObjectException si el repositorio no existe.
@@ -116,21 +164,15 @@ class AluRepo:
         if target_subdir is None:
             target_subdir = rama
 
-        gh = github.Github(self.auth_token)
-        repo = self.gh_repo or gh.get_repo(self.repo_full)
-        gitref = repo.get_git_ref(f"heads/{rama}")
-        prefix_re = re.compile(re.escape(target_subdir.rstrip("/") + "/"))
+        gh = github_client.client(self.auth_token, self.api_url)
+        repo = self.gh_repo or self._api("get_repo", gh.get_repo, self.repo_full)
+
+        gitref = self._branch_ref(repo, rama)
 
         # Estado actual del repo.
         cur_sha = gitref.object.sha
-        # NOTE: como solo trabajamos en un subdirectorio, se podría limitar el uso
-        # de recursive a ese directorio (si trabajáramos con repos muy grandes).
-        cur_tree = repo.get_git_tree(cur_sha, recursive=True)
-        cur_commit = repo.get_git_commit(cur_sha)
-
-        # Tree de la entrega en master, para manejar borrados.
-        baseref = repo.get_git_ref(f"heads/{repo.default_branch}")
-        base_tree = repo.get_git_tree(baseref.object.sha, recursive=True)
+        cur_commit = self._api("get_git_commit", repo.get_git_commit, cur_sha)
+        cur_tree = cur_commit.tree
 
         # Examinar el repo de entregas para obtener los commits a aplicar.
         entrega_repo = git.Repo(entrega_dir, search_parent_directories=True)
@@ -147,100 +189,283 @@ class AluRepo:
             if commit.authored_date > cur_commit_date.timestamp():
                 pending_commits.append(commit)
 
-        for commit in reversed(pending_commits):
+        if pending_commits:
+            # Solo interesan los archivos del subdirectorio de la entrega (para
+            # calcular los borrados), no el árbol entero.
+            cur_files = self._subtree_blobs(repo, cur_sha, target_subdir)
+
+            # Archivos de la entrega en master, que nunca se borran.
+            if repo.default_branch == rama:
+                base_sha = cur_sha
+            else:
+                base_sha = self._branch_ref(repo, repo.default_branch).object.sha
+            base_files = self._subtree_blobs(repo, base_sha, target_subdir)
+
+        # Mensajes de los commits a crear, del más antiguo al más reciente.
+        messages = [EMOJI_REGEX.sub("", c.message) for c in pending_commits]
+        if squash and len(pending_commits) > 1:
+            older = "\n".join(f"  - {c.summary}" for c in pending_commits[1:])
+            messages = [f"{messages[0]}\n\nIncluye las entregas anteriores:\n{older}"]
+            pending_commits = pending_commits[:1]
+
+        for commit, message in zip(reversed(pending_commits), reversed(messages)):
             entrega_tree = commit.tree.join(entrega_relpath)
-            tree_contents = tree_to_github(entrega_tree, target_subdir, repo)
-            if not tree_contents:
+            new_files = {
+                path: sha
+                for path, (sha, _) in tree_blobs(entrega_tree, target_subdir).items()
+            }
+            if not new_files:
                 continue
-            entrega_files = set(tree_contents.keys())
-            tree_elements = list(tree_contents.values())
-            tree_elements.extend(
-                deleted_files(entrega_files, cur_tree, prefix_re, base_tree)
+            # Solo se envían los archivos que cambiaron respecto a Github (y,
+            # de ellos, solo el contenido de los blobs que Github no tiene).
+            tree_contents = tree_to_github(
+                entrega_tree,
+                target_subdir,
+                repo,
+                remote_blobs=cur_files,
+                known_blobs={*cur_files.values(), *base_files.values()},
+                stats=self.stats,
             )
+            deletions = deleted_files(set(new_files), set(cur_files), set(base_files))
+            if not tree_contents and not deletions:
+                continue
+            tree_elements = list(tree_contents.values())
+            tree_elements.extend(deletions)
             author_date = datetime.fromtimestamp(commit.authored_date).astimezone()
             author_info = github.InputGitAuthor(
                 ghuser, f"{ghuser}@users.noreply.github.com", author_date.isoformat()
             )
-            cur_tree = repo.create_git_tree(tree_elements, cur_tree)
-            cur_commit = repo.create_git_commit(
-                EMOJI_REGEX.sub("", commit.message), cur_tree, [cur_commit], author_info
+            cur_tree = self._api(
+                "create_git_tree", repo.create_git_tree, tree_elements, cur_tree
             )
-            # Se necesita obtener el árbol de manera recursiva para tener
-            # los contenidos del subdirectorio de la entrega.
-            cur_tree = repo.get_git_tree(cur_tree.sha, recursive=True)
+            cur_commit = self._api(
+                "create_git_commit",
+                repo.create_git_commit,
+                message,
+                cur_tree,
+                [cur_commit],
+                author_info,
+            )
+            # El nuevo contenido del subdirectorio se conoce sin consultar a
+            # Github: los archivos enviados, más los preservados de master.
+            cur_files = {p: sha for p, sha in cur_files.items() if p in base_files}
+            cur_files.update(new_files)
 
-        gitref.edit(cur_commit.sha)
+        if cur_commit.sha != cur_sha:
+            self._api("edit_ref", gitref.edit, cur_commit.sha)
 
         # Crear checkrun si se recibió la salida del corrector.
         if checkrun is not None:
             nombre = checkrun.pop("name", rama)
-            repo.create_check_run(nombre, cur_commit.sha, **checkrun)
+            self._api(
+                "create_check_run",
+                repo.create_check_run,
+                nombre,
+                cur_commit.sha,
+                **checkrun,
+            )
+
+    def _api(self, name, method, *args, **kwargs):
+        """Llama a un método de la API de Github, contabilizándolo en stats."""
+        self.stats["api_calls"] += 1
+        self.stats[f"api_calls.{name}"] += 1
+        return method(*args, **kwargs)
+
+    def _branch_ref(self, repo: GithubRepo, rama: str) -> GitRef:
+        """Obtiene la referencia de una rama (una sola request).
+
+        No se usa get_git_refs(), que pagina por todas las referencias del
+        repositorio (incluyendo tags y refs/pull/*).
+
+        Raises:
+          github.UnknownObjectException si la rama no existe.
+        """
+        not_found = {"message": f"No existe la rama {rama}"}
+        try:
+            gitref = self._api("get_git_ref", repo.get_git_ref, f"heads/{rama}")
+        except github.UnknownObjectException:
+            raise github.UnknownObjectException(404, not_found, None) from None
+        # Si no hay una rama con ese nombre exacto, Github devuelve la lista
+        # de las que empiezan con él (p.ej. "tp1" → "tp1-bis").
+        if gitref.ref != f"refs/heads/{rama}":
+            raise github.UnknownObjectException(404, not_found, None)
+        return gitref
+
+    def _subtree_blobs(
+        self, repo: GithubRepo, tree_sha: str, subdir: str
+    ) -> Dict[str, str]:
+        """Devuelve los archivos de un subdirectorio de un árbol (o commit).
+
+        Se descarga (o se lee del caché) el listado recursivo del árbol
+        entero, y se lo filtra localmente: es una sola request, en lugar de
+        una por cada componente de la ruta más la del subdirectorio.
+
+        Returns:
+          un diccionario de ruta completa (incluyendo subdir) a sha del blob.
+        """
+        prefix = subdir_prefix(subdir)
+        return {
+            path: sha
+            for path, (kind, sha) in self._tree_listing(repo, tree_sha).items()
+            if kind == "blob" and path.startswith(prefix)
+        }
+
+    def _tree_listing(self, repo: GithubRepo, sha: str) -> TreeListing:
+        """Listado recursivo de un árbol, cacheado en Redis por su sha.
+
+        El sha puede ser también el de un commit (se lista su árbol).
+        """
+        key = f"github:tree:{sha}:r"
+
+        if (cached := redis_conn.get(key)) is not None:
+            self.stats["tree_cache_hits"] += 1
+            return json.loads(cached)
+
+        tree = self._api("get_git_tree", repo.get_git_tree, sha, recursive=True)
+        listing = {e.path: [e.type, e.sha] for e in tree.tree}
+        self.stats["tree_entries"] += len(listing)
+        redis_conn.set(key, json.dumps(listing), ex=TREE_CACHE_TTL)
+        return listing
+
+
+class SkelMirror:
+    """Copia local (bare) de un repositorio esqueleto.
+
+    La copia se crea con `git clone --mirror` la primera vez, y luego solo se
+    actualiza incrementalmente con `git fetch`. Varios procesos pueden usar
+    la misma copia: las actualizaciones se serializan con un lock de archivo.
+    """
+
+    def __init__(self, repo_full: str, mirror_dir: pathlib.Path):
+        self.url = f"git@github.com:{repo_full}"
+        self.path = mirror_dir / f"{repo_full}.git"
+        self._lockfile = self.path.with_name(f"{self.path.name}.lock")
+        self._stamp = self.path / "fetched_at"
+
+    def update(self, max_age: float = MIRROR_MAX_AGE) -> None:
+        """Crea la copia, o la actualiza si tiene más de `max_age` segundos."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(self._lockfile, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not self.path.exists():
+                # Se clona en un directorio temporal para que nunca quede una
+                # copia a medias si el clone falla.
+                tmpdir = tempfile.mkdtemp(dir=self.path.parent)
+                try:
+                    git.Repo.clone_from(self.url, tmpdir, mirror=True)
+                    os.rename(tmpdir, self.path)
+                except BaseException:
+                    shutil.rmtree(tmpdir, ignore_errors=True)
+                    raise
+            elif time.time() - self._fetched_at() >= max_age:
+                git.cmd.Git(working_dir=self.path).fetch("--prune", "origin")
+            else:
+                return
+            self._stamp.touch()
+
+    def push_to(self, repo_full: str) -> None:
+        """Hace push de todas las ramas de la copia a otro repositorio."""
+        git.cmd.Git(working_dir=self.path).push(
+            [f"git@github.com:{repo_full}", "refs/heads/*:refs/heads/*"]
+        )
+
+    def _fetched_at(self) -> float:
+        try:
+            return self._stamp.stat().st_mtime
+        except FileNotFoundError:
+            return 0
+
+
+def tree_blobs(tree: git.Tree, target_subdir: str) -> Dict[str, Tuple[str, int]]:
+    """Lista los archivos de un commit de Git que se sincronizan con Github.
+
+    Returns:
+      un diccionario donde las claves son rutas en el repo, y los valores el
+      sha (en hexadecimal) y el modo de cada blob.
+    """
+    odb = tree.repo.odb
+    entries = traverse_tree_recursive(odb, tree.binsha, subdir_prefix(target_subdir))
+
+    # TODO: get exclusion list from repos.yml
+    return {
+        path: (bin_to_hex(sha).decode("ascii"), mode)
+        for sha, mode, path in entries
+        if not path.endswith("README.md")
+    }
 
 
 def tree_to_github(
-    tree: git.Tree, target_subdir: str, gh_repo: GithubRepo
+    tree: git.Tree,
+    target_subdir: str,
+    gh_repo: GithubRepo,
+    remote_blobs: Optional[Dict[str, str]] = None,
+    known_blobs: Optional[Set[str]] = None,
+    stats: Optional[Counter[str]] = None,
 ) -> Dict[str, InputGitTreeElement]:
     """Extrae los contenidos de un commit de Git en formato Tree de Github.
 
+    Los SHA de los blobs son los mismos en Git y en Github. Así, si se
+    especifica `remote_blobs` (ruta → sha de los archivos en el árbol sobre
+    el que se creará el nuevo), se omiten los archivos que no cambiaron; y
+    los blobs que Github ya tiene (`known_blobs`, por omisión los de
+    `remote_blobs`) se referencian por su sha, sin enviar el contenido.
+
     Returns:
       un diccionario donde las claves son rutas en el repo, y los valores
       el InputGitTreeElement que los modifica.
     """
     odb = tree.repo.odb
-    target_subdir = target_subdir.rstrip("/") + "/"
-    entries = traverse_tree_recursive(odb, tree.binsha, target_subdir)
+    remote_blobs = remote_blobs or {}
+    if known_blobs is None:
+        known_blobs = set(remote_blobs.values())
+    stats = stats if stats is not None else collections.Counter()
     contents = {}
 
-    for sha, mode, path in entries:
-        # TODO: get exclusion list from repos.yml
-        if path.endswith("README.md"):
+    for path, (sha, mode) in tree_blobs(tree, target_subdir).items():
+        if remote_blobs.get(path) == sha:
+            continue
+        if sha in known_blobs:
+            contents[path] = InputGitTreeElement(path, f"{mode:o}", "blob", sha=sha)
             continue
         fileobj = io.BytesIO()
-        stream_copy(odb.stream(sha), fileobj)
-        fileobj.seek(0)
+        stream_copy(odb.stream(hex_to_bin(sha)), fileobj)
+        data = fileobj.getvalue()
+        stats["bytes_sent"] += len(data)
         try:
-            text = fileobj.read().decode("utf-8")
+            text = data.decode("utf-8")
             input_elem = InputGitTreeElement(path, f"{mode:o}", "blob", text)
         except UnicodeDecodeError:
             # POST /trees solo permite texto, hay que crear un blob para binario.
-            fileobj.seek(0)
-            data = base64.b64encode(fileobj.read())
-            blob = gh_repo.create_git_blob(data.decode("ascii"), "base64")
+            b64data = base64.b64encode(data).decode("ascii")
+            stats["api_calls"] += 1
+            stats["api_calls.create_git_blob"] += 1
+            blob = gh_repo.create_git_blob(b64data, "base64")
             input_elem = InputGitTreeElement(path, f"{mode:o}", "blob", sha=blob.sha)
-        finally:
-            contents[path] = input_elem
+        contents[path] = input_elem
 
     return contents
 
 
+def subdir_prefix(target_subdir: str) -> str:
+    """Prefijo de las rutas de un subdirectorio ("" para el toplevel)."""
+    target_subdir = target_subdir.strip("/")
+    return f"{target_subdir}/" if target_subdir else ""
+
+
 def deleted_files(
-    new_files: Set[str],
-    cur_tree: GithubTree,
-    match_re: Optional[re.Pattern] = None,
-    preserve_from: Optional[GithubTree] = None,
+    new_files: Set[str], cur_files: Set[str], preserve_files: Set[str]
 ) -> List[InputGitTreeElement]:
     """Calcula los archivos a borrar en el repositorio junto con la entrega.
 
-    Dada una lista que representa los contenidos actuales de la nueva
-    entrega, y dado el árbol existente, esta función calcula los archivos
-    que deben ser borrados, y los devuelve en una lista. (Para borrar
-    un archivo a través de la API de Github, lo que se necesita es un
+    Dado el conjunto de archivos de la nueva entrega, y los archivos que
+    existen actualmente en su subdirectorio, esta función calcula los archivos
+    que deben ser borrados, y los devuelve en una lista. (Para borrar un
+    archivo a través de la API de Github, lo que se necesita es un
     InputGitTreeElement con sha=None.)
 
-    La expresión regular `match_re` se usa para filtrar los subdirectorios
-    sobre los que procesar los borrados. Si se especifica `preserve_from`,
-    nunca se borrarán archivos que estén presentes en ese árbol.
+    Nunca se borran archivos presentes en `preserve_files` (p.ej., los de la
+    rama principal).
     """
-
-    def filter_tree(t: GithubTree) -> Set[str]:
-        return {
-            e.path
-            for e in t.tree
-            if e.type == "blob" and (not match_re or match_re.match(e.path))
-        }
-
-    cur_files = filter_tree(cur_tree)
-    preserve_files = filter_tree(preserve_from) if preserve_from else set()
-
     deletions = cur_files - new_files - preserve_files
     return [InputGitTreeElement(path, "100644", "blob", sha=None) for path in deletions]
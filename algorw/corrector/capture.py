@@ -0,0 +1,165 @@
+"""Ejecución del worker con salida acotada y tiempo límite.
+
+Una entrega con, p.ej., un ciclo infinito que imprime por pantalla no debe
+poder dejar un proceso de corrección bloqueado, ni agotar su memoria. Por
+eso la salida del worker se lee a medida que se produce, y solo se guardan
+los primeros MAX_HEAD bytes y los últimos MAX_TAIL bytes (en un buffer
+circular); y si el worker no termina en el tiempo límite, se mata su grupo
+de procesos entero (el worker corre en su propia sesión, de modo que se
+incluyen los programas de la entrega que haya lanzado).
+"""
+
+import collections
+import os
+import signal
+import subprocess
+import threading
+
+from typing import BinaryIO, Callable, Deque, NamedTuple, Sequence, Tuple
+
+
+__all__ = [
+    "Captured",
+    "run_captured",
+]
+
+MAX_HEAD = 64 * 1024
+MAX_TAIL = 64 * 1024
+
+CHUNK_SIZE = 64 * 1024
+
+OMITTED_MARK = "\n\n[... se omitieron {} bytes de la salida ...]\n\n"
+
+
+class Captured(NamedTuple):
+    output: bytes
+    retcode: int
+    timed_out: bool
+
+    # Cantidad de bytes de la salida que se descartaron (0 si ninguno); en
+    # ese caso, `output` lleva una marca en el lugar de los bytes omitidos.
+    omitted: int
+
+
+class _Reader(threading.Thread):
+    """Lee un stream guardando solo el comienzo y el final."""
+
+    def __init__(self, stream: BinaryIO, max_head: int, max_tail: int):
+        super().__init__(daemon=True)
+        self.stream = stream
+        self.max_head = max_head
+        self.max_tail = max_tail
+        self.head = bytearray()
+        self.tail: Deque[bytes] = collections.deque()
+        self.tail_size = 0
+        self.omitted = 0
+
+    def run(self):
+        while chunk := self.stream.read1(CHUNK_SIZE):  # type: ignore
+            if (room := self.max_head - len(self.head)) > 0:
+                self.head += chunk[:room]
+                chunk = chunk[room:]
+            if chunk:
+                self.tail.append(chunk)
+                self.tail_size += len(chunk)
+            while self.tail and self.tail_size - len(self.tail[0]) >= self.max_tail:
+                self.tail_size -= len(dropped := self.tail.popleft())
+                self.omitted += len(dropped)
+
+    def result(self) -> Tuple[bytes, bytes]:
+        tail = b"".join(self.tail)
+        if (extra := len(tail) - self.max_tail) > 0:
+            tail = tail[extra:]
+            self.omitted += extra
+        return bytes(self.head), tail
+
+
+def run_captured(
+    args: Sequence,
+    feed: Callable[[BinaryIO], None],
+    *,
+    timeout: float,
+    max_head: int = MAX_HEAD,
+    max_tail: int = MAX_TAIL,
+) -> Captured:
+    """Corre un proceso, le pasa su entrada con `feed`, y captura su salida.
+
+    Args:
+      args: el comando a ejecutar.
+      feed: función que escribe la entrada estándar del proceso.
+      timeout: tiempo máximo (de reloj) que puede correr el proceso.
+      max_head, max_tail: bytes a conservar del comienzo y del final de la
+          salida (stdout y stderr combinados).
+
+    Returns:
+      un objeto Captured. Si se omitió parte de la salida, `output` contiene
+      solamente el comienzo y el final, separados por OMITTED_MARK.
+    """
+    proc = subprocess.Popen(
+        args,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+    )
+    timed_out = threading.Event()
+
+    # El pgid del worker es su pid, que se puede reutilizar en cuanto se
+    # recolecta el proceso. Por eso el grupo solo se mata mientras el worker
+    # no fue recolectado (a lo sumo es un zombie), bajo el mismo lock con que
+    # luego se lo recolecta.
+    lock = threading.Lock()
+    reaped = False
+
+    def on_timeout():
+        with lock:
+            if not reaped:
+                timed_out.set()
+                _kill_group(proc.pid)
+
+    # El timer también cubre el caso en que el proceso no lee su entrada, y
+    # feed() queda bloqueado escribiendo.
+    watchdog = threading.Timer(timeout, on_timeout)
+    watchdog.start()
+    reader = _Reader(proc.stdout, max_head, max_tail)  # type: ignore
+    reader.start()
+
+    try:
+        try:
+            feed(proc.stdin)  # type: ignore
+            proc.stdin.close()  # type: ignore
+        except BrokenPipeError:
+            pass
+        _wait_exited(proc.pid)
+    finally:
+        watchdog.cancel()
+        # Se mata lo que quede del grupo (si feed() falló, también el proceso
+        # principal): algún proceso suelto podría mantener abierto stdout.
+        with lock:
+            _kill_group(proc.pid)
+            proc.wait()
+            reaped = True
+        reader.join()
+        for pipe in (proc.stdin, proc.stdout):
+            try:
+                pipe.close()  # type: ignore
+            except BrokenPipeError:
+                pass
+
+    head, tail = reader.result()
+    if reader.omitted:
+        head += OMITTED_MARK.format(reader.omitted).encode("utf-8")
+
+    return Captured(head + tail, proc.returncode, timed_out.is_set(), reader.omitted)
+
+
+def _wait_exited(pid: int) -> None:
+    """Espera a que termine un proceso hijo, sin recolectarlo (WNOWAIT)."""
+    os.waitid(os.P_PID, pid, os.WEXITED | os.WNOWAIT)
+
+
+def _kill_group(pgid: int) -> None:
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
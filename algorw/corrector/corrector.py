@@ -5,7 +5,7 @@
 Las entradas al script son:
 
   - CorrectorTask: un objeto en la cola de mensajes con toda la información
-    y contenido de la entrega
+    de la entrega; el contenido se lee del BlobStore de la aplicación
 
   - SKEL_DIR: un directorio con los archivos “base” de cada TP, p. ej. las
     pruebas de la cátedra y los archivos .h
@@ -32,29 +32,36 @@ import datetime
 import email
 import email.message
 import email.policy
+import email.utils
 import io
 import os
 import pathlib
 import re
-import shutil
-import subprocess
 import sys
 import tarfile
 import textwrap
 import zipfile
 
 from pathlib import PurePath
-from typing import Dict, Optional, Set
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from dotenv import load_dotenv
 from github import GithubException
+from rq import get_current_job  # type: ignore
 
 from config import Settings, load_config
 
-from .. import utils
-from ..common.tasks import CorrectorTask
+from ..app import github_client, github_tokens, outbox
+from ..app.queue import blob_store, light_queue
+from ..common import zipfiles
+from ..common.tasks import CorrectorTask, RepoSync
 from . import ai_corrector
 from .alu_repos import AluRepo
+from .capture import Captured, run_captured
+from .moss import Moss
+from .results import ResultCache, file_hash
+from .skel import cached_tar, send_tar
+from .stats import JobStats
 
 
 load_dotenv()
@@ -72,25 +79,27 @@ WORKER_BIN = ROOT_DIR / os.environ["CORRECTOR_WORKER"]
 DATA_DIR = ROOT_DIR / os.environ["CORRECTOR_TPS"]
 SKEL_DIR = ROOT_DIR / os.environ["CORRECTOR_SKEL"]
 GITHUB_URL = "https://github.com/" + os.environ["CORRECTOR_GH_REPO"]
+CACHE_DIR = ROOT_DIR / os.environ.get("CORRECTOR_CACHE", "cache")
+WORKER_TIMEOUT = float(os.environ.get("CORRECTOR_TIMEOUT", 120))
+# Tiempo límite del job en rq: el del worker más un margen para descomprimir,
+# guardar en Moss y sincronizar con Github. Si rq matara el job antes que
+# run_captured() al worker, no se respondería el timeout al alumno.
+JOB_TIMEOUT = int(WORKER_TIMEOUT) + 180
+MIRROR_DIR = CACHE_DIR / "mirrors"
+STATS_FILE = ROOT_DIR / os.environ.get("CORRECTOR_STATS", "stats.jsonl")
+
+# Archivo de una entrega: ruta relativa, ZipInfo y contenido.
+EntregaFile = Tuple[PurePath, zipfile.ZipInfo, bytes]
 
 AUSENCIA_REGEX = re.compile(r" \(ausencia\)$")
 TODO_OK_REGEX = re.compile(r"^Todo OK$", re.M)
 TODO_OK_OR_ERROR = re.compile(r"^(Todo OK|ERROR)$", re.M)
 
+TIMEOUT_MESSAGE = "\nERROR\n\nLa corrección superó el tiempo límite de {:.0f} s.\n"
 
-# Archivos que no aceptamos en las entregas.
-FORBIDDEN_EXTENSIONS = {
-    ".o",
-    ".class",
-    ".jar",
-    ".pyc",
-}
-
-FORBIDDEN_DIRECTORIES = {
-    ".git",
-}
 
 cfg: Settings = load_config()
+result_cache = ResultCache(CACHE_DIR / "results")
 
 
 class ErrorInterno(Exception):
@@ -107,84 +116,105 @@ def corregir_entrega(task: CorrectorTask) -> None:
 
     El flujo de la corrección se corta lanzando excepciones ErrorAlumno.
     """
+    stats = JobStats(task.tp_id)
+    if (job := get_current_job()) is not None and job.enqueued_at is not None:
+        stats.stages["queue"] = (job.started_at - job.enqueued_at).total_seconds()
+
     try:
-        procesar_entrega(task)
+        with stats.stage("total"), blob_store.open(task.zip_digest) as zip_data:
+            procesar_entrega(task, zipfile.ZipFile(zip_data), stats)
     except ErrorAlumno as ex:
+        stats.info["error"] = "alumno"
         send_reply(task.orig_headers, f"ERROR: {ex}.")
     except ErrorInterno as ex:
+        stats.info["error"] = "interno"
         print(ex, file=sys.stderr)
+    finally:
+        stats.save(STATS_FILE)
+
+    # Solo si la corrección terminó: si falló con una excepción inesperada,
+    # el job queda en la FailedJobRegistry de rq, y al reencolarlo se
+    # necesita el archivo (si no, lo termina borrando BlobStore.gc()).
+    blob_store.release(task.zip_digest)
 
 
-def procesar_entrega(task: CorrectorTask) -> None:
+def procesar_entrega(
+    task: CorrectorTask, zip_obj: zipfile.ZipFile, stats: JobStats
+) -> None:
     """Recibe el mensaje del alumno y lanza el proceso de corrección."""
     subj = task.orig_headers["Subject"]
     tp_id = task.tp_id
     padron = "_".join(task.legajos)
-    zip_obj = zipfile.ZipFile(io.BytesIO(task.zipfile))
     skel_dir = SKEL_DIR / tp_id
-    moss = Moss(DATA_DIR / task.repo_relpath)
+    moss = Moss(DATA_DIR, task.repo_relpath, GITHUB_URL)
     # TODO: componer el mensaje entero desde main.py
     commit_message = f"New {tp_id} upload from {padron}\n\n"
     commit_message += textwrap.fill(task.commit_desc, 72)
 
     if AUSENCIA_REGEX.search(subj):
         # No es una entrega real, por tanto no se envía al worker.
-        for path, zip_info in zip_walk(zip_obj):
-            moss.save_data(path, zip_obj.read(zip_info))
-        moss.commit_emoji()
-        moss.flush(commit_message, task.orig_headers["Date"])
-        send_reply(
-            task.orig_headers,
-            "Justificación registrada\n\n"
-            + "-- \nURL de esta entrega (para uso docente):\n"
-            + moss.url(),
-        )
+        with stats.stage("unzip"):
+            for path, _, data in zip_walk(zip_obj):
+                moss.save_data(path, data)
+        with stats.stage("moss"):
+            moss.commit_emoji()
+            moss.flush(commit_message, task.orig_headers["Date"])
+        with stats.stage("reply"):
+            send_reply(
+                task.orig_headers,
+                "Justificación registrada\n\n"
+                + "-- \nURL de esta entrega (para uso docente):\n"
+                + moss.url(),
+            )
         return
 
-    # Lanzar ya el proceso worker para poder pasar su stdin a tarfile.open().
-    worker = subprocess.Popen(
-        [WORKER_BIN],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
+    with stats.stage("skel"):
+        skel_tar = cached_tar(skel_dir, CACHE_DIR / "skel")
+
+    # Se lee cada archivo de la entrega una sola vez, y se guarda en Moss.
+    with stats.stage("unzip"):
+        files = list(zip_walk(zip_obj))
+        for path, _, data in files:
+            moss.save_data(path, data)
+
+    # Si ya se corrigió una entrega idéntica (mismos archivos, misma base del
+    # TP y mismo worker), se reutiliza su resultado sin correr el worker.
+    cache_key = ResultCache.key(
+        ((path.as_posix(), data) for path, _, data in files),
+        skel_tar.name,
+        file_hash(WORKER_BIN, CACHE_DIR / "hashes"),
     )
+    timed_out = False
+
+    if (cached := result_cache.get(cache_key)) is not None:
+        output, retcode = cached
+    else:
+        with stats.stage("worker"), stats.child_usage():
+            result = run_worker(skel_tar, files)
+        output = result.output.decode("utf-8", "replace")
+        retcode, timed_out = result.retcode, result.timed_out
+        stats.info.update(timed_out=timed_out, omitted_bytes=result.omitted)
+        if timed_out:
+            # No es un error interno: se responde como cualquier otro error.
+            output += TIMEOUT_MESSAGE.format(WORKER_TIMEOUT)
+        elif retcode == 0:
+            # No se guardan los errores internos, que pueden ser transitorios.
+            result_cache.put(cache_key, output, retcode)
+
+    stats.info.update(cached=cached is not None, retcode=retcode)
+    stats.info["output_bytes"] = len(output.encode("utf-8"))
+
+    with stats.stage("moss"):
+        moss.save_output(f"{subj}\n\n{output}")
+        moss.commit_emoji(output)
+        moss.flush(commit_message, task.orig_headers["Date"])
 
-    tar = tarfile.open(fileobj=worker.stdin, mode="w|", dereference=True)
-
-    # Añadir al archivo TAR la base del TP (skel_dir).
-    for entry in os.scandir(skel_dir):
-        path = PurePath(entry.path)
-        rel_path = path.relative_to(skel_dir)
-        tar.add(path, "skel" / rel_path)
-
-    # A continuación añadir los archivos de la entrega (ZIP).
-    for path, zip_info in zip_walk(zip_obj):
-        info = tarfile.TarInfo(("orig" / path).as_posix())
-        info.size = zip_info.file_size
-        info.mtime = zip_datetime(zip_info).timestamp()
-        info.type, info.mode = tarfile.REGTYPE, 0o644
-
-        moss.save_data(path, zip_obj.read(zip_info))
-        tar.addfile(info, zip_obj.open(zip_info.filename))
-
-    tar.close()
-
-    stdout, _ = worker.communicate()
-    output = stdout.decode("utf-8")
-    retcode = worker.wait()
-
-    moss.save_output(f"{subj}\n\n{output}")
-    moss.commit_emoji(output)
-    moss.flush(commit_message, task.orig_headers["Date"])
-
-    if retcode != 0:
+    if retcode != 0 and not timed_out:
         raise ErrorInterno(output)
 
     # Sincronizar la entrega con los repositorios individuales.
     if task.repo_sync is not None:
         checkrun = None
-        dest_repo = task.repo_sync.alu_repo
-        auth_token = task.repo_sync.auth_token
 
         if m := TODO_OK_OR_ERROR.search(output):
             result = m.group(1)
@@ -199,14 +229,19 @@ def procesar_entrega(task: CorrectorTask) -> None:
                 },
             }
 
-        try:
-            alu_repo = AluRepo(dest_repo.full_name, auth_token=auth_token)
-            alu_repo.ensure_exists(skel_repo="algorw-alu/algo2_tps")
-            alu_repo.sync(moss.location(), tp_id, task.repo_sync.github_id, checkrun)
-        except GithubException as ex:
-            print(f"error al sincronizar: {ex}", file=sys.stderr)
+        if (delay := github_client.defer_delay(cfg.github_reserve)) > 0:
+            # Quedan pocas requests a la API: la sincronización se posterga
+            # hasta que se reinicie el límite, y se responde sin esperarla.
+            stats.info["sync_deferred"] = delay
+            postergar_sincronizacion(
+                delay, task.repo_sync, tp_id, moss.location(), checkrun
+            )
         else:
-            if TODO_OK_REGEX.search(output):
+            with stats.stage("sync"):
+                alu_repo = sincronizar_entrega(
+                    task.repo_sync, tp_id, moss.location(), checkrun, stats
+                )
+            if alu_repo is not None and TODO_OK_REGEX.search(output):
                 # Insertar, por el momento, la URL del repositorio.
                 # TODO: insertar URL para un pull request si es el primer Todo OK.
                 message = "Esta entrega fue importada a:"
@@ -216,23 +251,98 @@ def procesar_entrega(task: CorrectorTask) -> None:
 
     quote = ai_corrector.vida_corrector(tp_id)
     firma = "URL de esta entrega (para uso docente):\n" + moss.url()
-    send_reply(task.orig_headers, f"{quote}{output}\n\n-- \n{firma}")
+    with stats.stage("reply"):
+        send_reply(task.orig_headers, f"{quote}{output}\n\n-- \n{firma}")
+
 
+def sincronizar_entrega(
+    repo_sync: RepoSync,
+    tp_id: str,
+    location: pathlib.Path,
+    checkrun: Optional[Dict],
+    stats: Optional[JobStats] = None,
+) -> Optional[AluRepo]:
+    """Sincroniza una entrega con el repositorio de alumne.
 
-def is_forbidden(path):
-    return (
-        path.is_absolute() or ".." in path.parts or path.suffix in FORBIDDEN_EXTENSIONS or any(map(lambda p: p in FORBIDDEN_DIRECTORIES, path.parts))
+    Returns:
+      el AluRepo sincronizado, o None si hubo un error de la API de Github.
+    """
+    alu_repo = None
+    try:
+        # El token se obtiene ahora, y no al recibir la entrega: el job pudo
+        # haber esperado en la cola más de lo que dura un token.
+        auth_token = github_tokens.installation_token(repo_sync.alu_repo)
+        alu_repo = AluRepo(repo_sync.alu_repo.full_name, auth_token=auth_token)
+        alu_repo.ensure_exists(skel_repo=cfg.skel_repo, mirror_dir=MIRROR_DIR)
+        alu_repo.sync(
+            location,
+            tp_id,
+            repo_sync.github_id,
+            checkrun,
+            squash=cfg.sync_squash,
+        )
+    except GithubException as ex:
+        print(f"error al sincronizar: {ex}", file=sys.stderr)
+        return None
+    finally:
+        if stats is not None and alu_repo is not None:
+            stats.info["github_calls"] = alu_repo.stats["api_calls"]
+            stats.info["github_tree_entries"] = alu_repo.stats["tree_entries"]
+    return alu_repo
+
+
+def postergar_sincronizacion(delay: float, *args) -> None:
+    """Encola sincronizar_postergada() para dentro de `delay` segundos."""
+    light_queue.enqueue_in(
+        datetime.timedelta(seconds=delay), sincronizar_postergada, *args
     )
 
-def is_skippable(path):
-    for ctx in [".git", ".DS_Store", "__MACOSX"]:
-        if ctx in path.parts:
-            return True
-    return False
 
+def sincronizar_postergada(
+    repo_sync: RepoSync,
+    tp_id: str,
+    location: pathlib.Path,
+    checkrun: Optional[Dict],
+) -> None:
+    """Job para sincronizar una entrega una vez reiniciado el límite de la API.
 
-def zip_walk(zip_obj, strip_toplevel=True):
-    """Itera sobre los archivos de un zip.
+    Como AluRepo.sync() aplica todas las entregas pendientes, no importa si
+    mientras tanto hubo otras entregas del mismo TP.
+    """
+    if (delay := github_client.defer_delay(cfg.github_reserve)) > 0:
+        postergar_sincronizacion(delay, repo_sync, tp_id, location, checkrun)
+        return
+
+    sincronizar_entrega(repo_sync, tp_id, location, checkrun)
+
+
+def run_worker(skel_tar: pathlib.Path, files: List[EntregaFile]) -> Captured:
+    """Corre el worker sobre los archivos de una entrega.
+
+    La salida se acota a los primeros y últimos bytes, y si el worker supera
+    WORKER_TIMEOUT se lo mata junto con todos sus subprocesos (ver capture.py).
+    """
+
+    def write_tar(stdin):
+        # Enviar primero la base del TP (skel_dir), pre-empaquetada en CACHE_DIR.
+        send_tar(skel_tar, stdin)
+        tar = tarfile.open(fileobj=stdin, mode="w|")
+
+        # A continuación añadir los archivos de la entrega (ZIP).
+        for path, zip_info, data in files:
+            info = tarfile.TarInfo(("orig" / path).as_posix())
+            info.size = len(data)
+            info.mtime = zip_datetime(zip_info).timestamp()
+            info.type, info.mode = tarfile.REGTYPE, 0o644
+            tar.addfile(info, io.BytesIO(data))
+
+        tar.close()
+
+    return run_captured([WORKER_BIN], write_tar, timeout=WORKER_TIMEOUT)
+
+
+def zip_walk(zip_obj, strip_toplevel=True) -> Iterator[EntregaFile]:
+    """Itera sobre los archivos de un zip, descomprimiendo cada uno una vez.
 
     Args:
         - zip_obj: un objeto zipfile.ZipFile abierto en modo lectura
@@ -240,99 +350,13 @@ def zip_walk(zip_obj, strip_toplevel=True):
             debe quitar el nombre de directorio común (si lo hubiese)
 
     Yields:
-        - tuplas (nombre_archivo, zipinfo_object).
+        - tuplas (nombre_archivo, zipinfo_object, contenido).
     """
-    zip_files = [PurePath(f) for f in zip_obj.namelist()]
-    # Filtramos cualquier cosa relacionada a un .git
-    zip_files = [f for f in zip_files if not is_skippable(f)]
-    forbidden_files = [f for f in zip_files if is_forbidden(f)]
-    all_parents: Set[PurePath] = set()
-    common_parent = "."
-
-    if not zip_files:
-        raise ErrorAlumno("archivo ZIP vacío")
-
-    if forbidden_files:
-        raise ErrorAlumno(
-            "no se permiten archivos con estas extensiones:\n\n  • "
-            + "\n  • ".join(f.name for f in forbidden_files)
-        )
-
-    for path in zip_files:
-        all_parents.update(path.parents)
-
-    if strip_toplevel and len(zip_files) > 1:
-        parents = {p.parts[0] for p in zip_files}
-        if len(parents) == 1:
-            common_parent = parents.pop()
-
-    for fname in zip_files:
-        if fname not in all_parents:
-            try:
-                inf = zip_obj.getinfo(fname.as_posix())
-            except KeyError:
-                pass
-            else:
-                yield (fname.relative_to(common_parent), inf)
-
-
-class Moss:
-    """Guarda código fuente del alumno."""
-
-    def __init__(self, dest: pathlib.Path):
-        self._dest = dest
-        self._emoji: Optional[str] = None
-        shutil.rmtree(self._dest, ignore_errors=True)
-        self._dest.mkdir(parents=True)
-        self._git(["rm", "--cached", "-r", self._dest])
-
-    def location(self):
-        """Directorio donde se guardaron los archivos."""
-        return self._dest
-
-    def url(self):
-        short_rev = "git show -s --pretty=tformat:%h"
-        relative_dir = "git rev-parse --show-prefix"
-        return subprocess.check_output(
-            f'echo "{GITHUB_URL}/tree/$({short_rev})/$({relative_dir})"',
-            shell=True,
-            encoding="utf-8",
-            cwd=self._dest,
-        )
-
-    def save_data(self, relpath, contents):
-        """Guarda un archivo si es código fuente.
-
-        Devuelve True si se guardó, False si se decidió no guardarlo.
-        """
-        path = self._dest / relpath
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_bytes(contents)
-        return self._git(["add", relpath]) == 0
-
-    def flush(self, message: str, date: str) -> None:  # TODO: pass datetime?
-        """Termina de guardar los archivos en el repositorio."""
-        if self._emoji:
-            message = f"{self._emoji} {message}"
-        self._git(["add", "--no-ignore-removal", "."])
-        self._git(["commit", "-m", message, "--date", date])
-        self._git(["push", "--force-with-lease", "origin", ":"])
-
-    def _git(self, args):
-        subprocess.call(["git"] + args, cwd=self._dest)
-
-    def save_output(self, output):
-        filepath = self._dest / "README.md"
-        filepath.write_text(f"```\n{output}```")
-        return self._git(["add", filepath]) == 0
-
-    def commit_emoji(self, output=None):
-        if output is None:
-            self._emoji = ":question:"
-        elif "Todo OK" in output.split("\n", 1)[0]:
-            self._emoji = ":heavy_check_mark:"
-        else:
-            self._emoji = ":x:"
+    try:
+        for path, info in zipfiles.walk(zip_obj, strip_toplevel):
+            yield path, info, zipfiles.read_member(zip_obj, info)
+    except (zipfiles.InvalidZip, zipfile.BadZipFile) as ex:
+        raise ErrorAlumno(str(ex)) from ex
 
 
 def zip_datetime(info):
@@ -351,7 +375,6 @@ def send_reply(orig_headers: Dict[str, str], reply_text: str) -> None:
         print("ENVIARÍA: {}".format(reply_text), file=sys.stderr)
         return
 
-    creds = utils.get_oauth_credentials(cfg)
     reply = email.message.Message(email.policy.default)
     reply.set_payload(reply_text, "utf-8")
 
@@ -361,5 +384,6 @@ def send_reply(orig_headers: Dict[str, str], reply_text: str) -> None:
     reply["Subject"] = "Re: " + orig_headers["Subject"]
     reply["Reply-To"] = orig_headers.get("Reply-To", "")
     reply["In-Reply-To"] = orig_headers["Message-ID"]
+    reply["Message-ID"] = email.utils.make_msgid("corrector", "algorw.turing.pink")
 
-    return utils.sendmail(reply, creds)
+    outbox.enqueue(reply)
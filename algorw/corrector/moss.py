@@ -0,0 +1,213 @@
+"""Clase Moss para guardar las entregas en el repositorio de entregas.
+
+En lugar de usar el índice de Git (`git add` por cada archivo, seguido de
+`git commit`, lo que lanzaba decenas de procesos por entrega, cada uno
+re-escaneando un árbol de trabajo con todas las entregas históricas), los
+archivos se escriben directamente como objetos en la base de datos de Git,
+se construyen los árboles necesarios, y se crea el commit con una cantidad
+constante de llamadas a git.
+
+Los archivos también se escriben en el directorio de trabajo (AluRepo.sync
+lo usa para ubicar la entrega), pero el índice no se actualiza. Como no hay
+ningún index.lock de por medio, varios workers de rq pueden guardar entregas
+en el mismo repositorio a la vez (ver Moss.flush). El índice lo pone al día
+con HEAD algorw.corrector.pusher tras cada push; hasta entonces, `git status`
+muestra las entregas recientes como cambios sin commit.
+
+Como no se usa `git commit`, nada ejecuta `git gc --auto`: lo hace
+periódicamente algorw.corrector.pusher.
+"""
+
+import hashlib
+import io
+import itertools
+import pathlib
+import random
+import shutil
+import time
+
+from pathlib import PurePath
+from typing import Dict, List, Optional, Tuple
+
+import git  # type: ignore
+
+from git.objects.fun import tree_entries_from_data, tree_to_stream  # type: ignore
+from gitdb import IStream  # type: ignore
+
+
+__all__ = [
+    "Moss",
+]
+
+BLOB_MODE = 0o100644
+TREE_MODE = 0o040000
+
+# Valor anterior de una referencia que aún no existe (ver git-update-ref).
+ZERO_SHA = "0" * 40
+
+# Reintentos de Moss.flush() si otro proceso actualizó HEAD concurrentemente.
+MAX_UPDATE_ATTEMPTS = 20
+
+TreeEntry = Tuple[bytes, int, str]
+
+
+class Moss:
+    """Guarda código fuente del alumno."""
+
+    def __init__(self, repo_dir: pathlib.Path, relpath: PurePath, github_url: str):
+        self._repo = git.Repo(repo_dir)
+        self._relpath = relpath
+        self._dest = repo_dir / relpath
+        self._github_url = github_url
+        self._emoji: Optional[str] = None
+        self._files: Dict[str, bytes] = {}
+        self._commit: Optional[str] = None
+        shutil.rmtree(self._dest, ignore_errors=True)
+        self._dest.mkdir(parents=True)
+
+    def location(self):
+        """Directorio donde se guardaron los archivos."""
+        return self._dest
+
+    def url(self):
+        """URL en Github de la entrega, según el commit creado por flush()."""
+        assert self._commit is not None, "url() requiere llamar antes a flush()"
+        relpath = self._relpath.as_posix()
+        return f"{self._github_url}/tree/{self._commit[:7]}/{relpath}/"
+
+    def save_data(self, relpath, contents):
+        """Guarda un archivo si es código fuente.
+
+        Devuelve True si se guardó, False si se decidió no guardarlo.
+        """
+        path = self._dest / relpath
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(contents)
+        self._files[PurePath(relpath).as_posix()] = self._store(b"blob", contents)
+        return True
+
+    def save_output(self, output):
+        contents = f"```\n{output}```".encode("utf-8")
+        return self.save_data("README.md", contents)
+
+    def commit_emoji(self, output=None):
+        if output is None:
+            self._emoji = ":question:"
+        elif "Todo OK" in output.split("\n", 1)[0]:
+            self._emoji = ":heavy_check_mark:"
+        else:
+            self._emoji = ":x:"
+
+    def flush(self, message: str, date: str) -> None:  # TODO: pass datetime?
+        """Termina de guardar los archivos en el repositorio.
+
+        Se reemplaza, en el árbol de HEAD, el subdirectorio de la entrega por
+        los archivos guardados, y se crea el commit sin pasar por el índice.
+        """
+        if self._emoji:
+            message = f"{self._emoji} {message}"
+
+        entrega_tree = self._write_tree(self._files)
+
+        # Varios workers pueden estar guardando entregas a la vez: HEAD se
+        # actualiza solo si no cambió desde que se leyó (compare-and-swap) y,
+        # si cambió, se reconstruye el commit sobre el nuevo HEAD.
+        for attempt in itertools.count(1):
+            parent = self._head_commit()
+            root_tree = self._replace_subtree(
+                parent.tree.binsha if parent else None,
+                self._relpath.parts,
+                entrega_tree,
+            )
+            commit = git.Commit.create_from_tree(
+                self._repo,
+                git.Tree(self._repo, root_tree),
+                message,
+                parent_commits=[parent] if parent else [],
+                author_date=date,
+            )
+            # En un repositorio vacío, update-ref falla si HEAD ya existe.
+            old_sha = parent.hexsha if parent else ZERO_SHA
+            try:
+                self._repo.git.update_ref("HEAD", commit.hexsha, old_sha)
+            except git.GitCommandError:
+                if attempt >= MAX_UPDATE_ATTEMPTS:
+                    raise
+                time.sleep(random.uniform(0, 0.05 * attempt))
+            else:
+                break
+
+        # El push lo hace, agrupando varios commits, algorw.corrector.pusher.
+        self._commit = commit.hexsha
+
+    def _head_commit(self) -> Optional[git.Commit]:
+        """El commit de HEAD, o None si el repositorio no tiene commits."""
+        try:
+            return self._repo.head.commit
+        except ValueError:
+            return None
+
+    def _write_tree(self, files: Dict[str, bytes]) -> bytes:
+        """Escribe un árbol (y sus subárboles) a partir de ruta → blob."""
+        entries: List[TreeEntry] = []
+        subdirs: Dict[str, Dict[str, bytes]] = {}
+
+        for path, binsha in files.items():
+            name, sep, rest = path.partition("/")
+            if sep:
+                subdirs.setdefault(name, {})[rest] = binsha
+            else:
+                entries.append((binsha, BLOB_MODE, name))
+
+        for name, subfiles in subdirs.items():
+            entries.append((self._write_tree(subfiles), TREE_MODE, name))
+
+        return self._store_tree(entries)
+
+    def _replace_subtree(
+        self, tree: Optional[bytes], parts: Tuple[str, ...], subtree: bytes
+    ) -> bytes:
+        """Reemplaza la ruta `parts` del árbol `tree` por `subtree`.
+
+        Returns:
+          el binsha del nuevo árbol (solo se escriben los árboles modificados).
+        """
+        name, rest = parts[0], parts[1:]
+        entries = self._read_tree(tree) if tree is not None else []
+        current = next((e[0] for e in entries if e[2] == name), None)
+        entries = [e for e in entries if e[2] != name]
+
+        if rest:
+            subtree = self._replace_subtree(current, rest, subtree)
+
+        entries.append((subtree, TREE_MODE, name))
+        return self._store_tree(entries)
+
+    def _read_tree(self, binsha: bytes) -> List[TreeEntry]:
+        return tree_entries_from_data(self._repo.odb.stream(binsha).read())
+
+    def _store_tree(self, entries: List[TreeEntry]) -> bytes:
+        # Git ordena los subdirectorios como si su nombre terminara en "/".
+        entries.sort(key=lambda e: e[2] + "/" if e[1] == TREE_MODE else e[2])
+        buf = io.BytesIO()
+        tree_to_stream(entries, buf.write)
+        return self._store(b"tree", buf.getvalue())
+
+    def _store(self, kind: bytes, data: bytes) -> bytes:
+        """Guarda un objeto en la base de datos de Git, si no existía ya."""
+        header = b"%s %d\0" % (kind, len(data))
+        binsha = hashlib.sha1(header + data).digest()
+        if not self._has_object(binsha):
+            self._repo.odb.store(IStream(kind, len(data), io.BytesIO(data)))
+        return binsha
+
+    def _has_object(self, binsha: bytes) -> bool:
+        # has_object() solo busca entre los objetos sueltos (LooseObjectDB);
+        # los empaquetados por `git gc` se consultan con `git cat-file`.
+        if self._repo.odb.has_object(binsha):
+            return True
+        try:
+            self._repo.odb.info(binsha)
+        except ValueError:
+            return False
+        return True
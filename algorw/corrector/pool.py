@@ -0,0 +1,170 @@
+"""Supervisor de los procesos de corrección.
+
+En lugar de un único `rq worker` por instancia (que corregía las entregas
+de a una, mientras la cola crecía en las noches de entrega), este proceso
+mantiene un conjunto de workers de rq sobre la misma cola, por omisión uno
+por CPU (ver Settings.corrector_workers).
+
+Como algunos TPs (p.ej. los que corren Valgrind sobre pruebas pesadas)
+consumen mucho más que otros, se puede limitar cuántas entregas de un mismo
+TP se corrigen a la vez (ver Settings.tp_slots). Cada uno de esos TPs tiene
+su propia cola (ver queue.correction_queue), y solo tantos workers como su
+límite la atienden; esos workers, cuando no hay entregas del TP, corrigen
+las de la cola general. Así ningún worker queda esperando un lugar libre, y
+los jobs no se vuelven a encolar.
+
+Señales:
+
+  - SIGTERM/SIGINT: drenado; los workers terminan la corrección en curso y
+    salen, y luego sale el supervisor.
+
+  - SIGHUP: reinicio; cada worker termina su corrección en curso y se lo
+    reemplaza por uno nuevo (p.ej. tras actualizar el código).
+
+Uso (ver entregas.ini):
+
+    python -m algorw.corrector.pool [NUM_WORKERS [QUEUE]]
+
+Por omisión, la cola es la de correcciones (Settings.job_queue); también
+se usa, con menos workers, para la cola de ausencias y parcialitos (que no
+tiene límites por TP).
+"""
+
+import contextlib
+import logging
+import os
+import signal
+import sys
+import time
+
+from typing import Dict, List, Mapping, Set
+
+from rq import Queue, Worker  # type: ignore
+
+from config import load_config
+
+from ..app.queue import correction_queue, redis_conn, task_queue
+
+
+__all__ = [
+    "Supervisor",
+    "worker_layout",
+]
+
+cfg = load_config()
+
+# Pausa antes de reemplazar un worker que terminó inesperadamente.
+RESPAWN_DELAY = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+def worker_layout(
+    size: int, queue: Queue, tp_slots: Mapping[str, int]
+) -> List[List[Queue]]:
+    """Colas que atiende cada worker, en orden de prioridad.
+
+    La cola de un TP con límite la atienden solo los primeros `limit` workers
+    (que, sin entregas de ese TP, corrigen las de la cola general); el resto
+    atiende solo la cola general. Un mismo worker puede atender las colas de
+    varios TPs: como corrige de a una entrega, los límites se respetan igual.
+    """
+    return [
+        [
+            correction_queue(tp_id)
+            for tp_id, limit in sorted(tp_slots.items())
+            if i < limit
+        ]
+        + [queue]
+        for i in range(size)
+    ]
+
+
+class Supervisor:
+    """Mantiene workers de rq escuchando en una cola (ver worker_layout)."""
+
+    def __init__(
+        self, size: int, queue: Queue = task_queue, tp_slots: Mapping[str, int] = {}
+    ):
+        self.layout = worker_layout(size, queue, tp_slots)
+        self.queue = queue
+        self.draining = False
+        # Workers vivos: pid → posición en self.layout.
+        self._workers: Dict[int, int] = {}
+        self._retiring: Set[int] = set()
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._drain)
+        signal.signal(signal.SIGINT, self._drain)
+        signal.signal(signal.SIGHUP, self._restart)
+
+        logger.info(
+            "iniciando %d workers en la cola %s", len(self.layout), self.queue.name
+        )
+
+        while not self.draining or self._workers:
+            if not self.draining:
+                running = set(self._workers.values())
+                for slot in range(len(self.layout)):
+                    if slot not in running:
+                        self._spawn(slot)
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                continue
+            self._workers.pop(pid, None)
+            if pid in self._retiring:
+                self._retiring.discard(pid)
+            elif not self.draining:
+                logger.warning("worker %d terminó inesperadamente (%#x)", pid, status)
+                time.sleep(RESPAWN_DELAY)
+
+        logger.info("todos los workers terminaron")
+
+    def _spawn(self, slot: int) -> None:
+        queues = self.layout[slot]
+        pid = os.fork()
+        if pid == 0:
+            # Worker.work() instala sus propios handlers de SIGTERM/SIGINT
+            # (warm shutdown: termina el job en curso y sale).
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                # El scheduler ejecuta los jobs postergados con enqueue_in().
+                worker = Worker(queues, connection=redis_conn)
+                worker.work(with_scheduler=True)
+            except BaseException:
+                logger.exception("error en worker")
+                os._exit(1)
+            os._exit(0)
+        self._workers[pid] = slot
+
+    def _stop_workers(self) -> None:
+        for pid in self._workers:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+
+    def _drain(self, signum, frame):
+        logger.info("drenando: se espera a que terminen las correcciones en curso")
+        self.draining = True
+        self._stop_workers()
+
+    def _restart(self, signum, frame):
+        logger.info("reiniciando workers")
+        self._retiring.update(self._workers)
+        self._stop_workers()
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else cfg.corrector_workers
+    if len(sys.argv) > 2:
+        queue, tp_slots = Queue(sys.argv[2], connection=redis_conn), {}
+    else:
+        queue, tp_slots = task_queue, cfg.tp_slots
+    Supervisor(size or os.cpu_count() or 1, queue, tp_slots).run()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
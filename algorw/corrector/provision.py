@@ -0,0 +1,88 @@
+"""Creación anticipada de los repositorios de alumnes.
+
+AluRepo.ensure_exists() crea el repositorio de une alumne cuando se
+sincroniza su primera entrega, lo que alarga esa corrección. Este comando
+crea de antemano, de a varios a la vez, todos los repositorios de la hoja
+Repos de la planilla que aún no existan, a partir de la copia local del
+esqueleto (ver SkelMirror).
+
+Si quedan pocas requests a la API de Github (Settings.github_reserve), los
+repositorios restantes se omiten; basta con volver a ejecutarlo más tarde.
+
+Uso (con el mismo entorno que el corrector):
+
+    python -m algorw.corrector.provision [CONCURRENCIA]
+"""
+
+import collections
+import logging
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Counter, List
+
+from config import load_config
+from planilla import fetch_planilla
+
+from ..app import github_client, github_tokens
+from ..common.models import Repo
+from .alu_repos import AluRepo, SkelMirror
+from .corrector import MIRROR_DIR
+
+
+__all__ = [
+    "provision",
+]
+
+cfg = load_config()
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = 8
+
+
+def provision(repos: List[Repo], concurrency: int = CONCURRENCY) -> Counter[str]:
+    """Crea los repositorios que no existan.
+
+    Returns:
+      la cantidad de repositorios creados, existentes, omitidos y con error.
+    """
+    # Se actualiza la copia del esqueleto una sola vez, antes de empezar.
+    SkelMirror(cfg.skel_repo, MIRROR_DIR).update(max_age=0)
+
+    # Cada hilo usa su propio cliente de Github (un AluRepo por repositorio),
+    # y github_client le asigna su propia sesión HTTP.
+    def ensure(repo: Repo) -> str:
+        if github_client.defer_delay(cfg.github_reserve) > 0:
+            return "omitidos"
+        try:
+            alu_repo = AluRepo(
+                repo.full_name, auth_token=github_tokens.installation_token(repo)
+            )
+            created = alu_repo.ensure_exists(
+                skel_repo=cfg.skel_repo, mirror_dir=MIRROR_DIR
+            )
+        except Exception:
+            logger.exception("no se pudo crear %s", repo.full_name)
+            return "errores"
+        if created:
+            logger.info("creado %s", repo.full_name)
+            return "creados"
+        return "existentes"
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return collections.Counter(executor.map(ensure, repos))
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else CONCURRENCY
+    repos = fetch_planilla().repos()
+    logger.info("%d repositorios en la planilla", len(repos))
+    counts = provision(repos, concurrency)
+    print(", ".join(f"{n} {estado}" for estado, n in sorted(counts.items())))
+    if counts["omitidos"]:
+        print("quedan pocas requests a la API de Github; volver a ejecutar más tarde")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
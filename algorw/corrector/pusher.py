@@ -0,0 +1,117 @@
+"""Daemon que sube al remoto los commits del repositorio de entregas.
+
+Moss.flush() solo crea el commit local; el push a Github, que es lento y
+puede fallar por la red, lo hace este proceso aparte. Cada vez que cambia
+la rama local, se espera a que pasen unos segundos sin commits nuevos (o
+un máximo de MAX_DELAY), y se suben todos juntos en un único push. Si el
+push falla, se reintenta con backoff exponencial.
+
+Además, como Moss crea los commits sin `git commit` (y sin índice), este
+proceso ejecuta `git gc --auto` cada GC_INTERVAL, para que los objetos
+sueltos no crezcan sin límite; y tras cada push actualiza el índice a HEAD,
+para que `git status` en el repositorio no muestre las entregas como
+borradas.
+
+Uso (ver entregas.ini):
+
+    python -m algorw.corrector.pusher
+"""
+
+import logging
+import subprocess
+import time
+
+import git  # type: ignore
+
+from .corrector import DATA_DIR
+
+
+# Intervalo de sondeo de la rama local.
+POLL_INTERVAL = 1.0
+
+# Se espera este tiempo sin commits nuevos antes de hacer push...
+QUIET_PERIOD = 3.0
+
+# ...pero nunca más que esto desde el primer commit pendiente.
+MAX_DELAY = 15.0
+
+# Límite del backoff entre reintentos de un push fallido.
+MAX_BACKOFF = 300.0
+
+# Intervalo mínimo entre ejecuciones de `git gc --auto`.
+GC_INTERVAL = 3600.0
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    repo = git.Repo(DATA_DIR)
+    pushed = None
+    backoff = POLL_INTERVAL
+    last_gc = 0.0
+
+    while True:
+        if time.monotonic() - last_gc >= GC_INTERVAL:
+            _gc(repo)
+            last_gc = time.monotonic()
+
+        head = _head(repo)
+        if head == pushed:
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        # Agrupar todos los commits que lleguen en los próximos segundos.
+        first_seen = last_change = time.monotonic()
+        while True:
+            time.sleep(POLL_INTERVAL)
+            now = time.monotonic()
+            if (new_head := _head(repo)) != head:
+                head, last_change = new_head, now
+            elif now - last_change >= QUIET_PERIOD or now - first_seen >= MAX_DELAY:
+                break
+
+        if _push(repo):
+            pushed, backoff = head, POLL_INTERVAL
+            _read_tree(repo, head)
+        else:
+            logger.warning("push falló; reintentando en %.0f s", backoff)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+
+def _head(repo: git.Repo) -> str:
+    return repo.head.commit.hexsha
+
+
+def _push(repo: git.Repo) -> bool:
+    start = time.monotonic()
+    ret = subprocess.call(
+        ["git", "push", "--force-with-lease", "origin", ":"],
+        cwd=repo.working_tree_dir,
+    )
+    logger.info("push terminado en %.1f s (código %d)", time.monotonic() - start, ret)
+    return ret == 0
+
+
+def _read_tree(repo: git.Repo, head: str) -> None:
+    # Solo este proceso escribe el índice (Moss no lo usa). Con -m se conserva
+    # el stat de las entradas que no cambiaron, y read-tree no recorre el
+    # directorio de trabajo: es barato aun con muchas entregas.
+    ret = subprocess.call(
+        ["git", "read-tree", "-m", head], cwd=repo.working_tree_dir
+    )
+    if ret != 0:
+        logger.warning("git read-tree terminó con código %d", ret)
+
+
+def _gc(repo: git.Repo) -> None:
+    # Los objetos recién escritos por Moss (aún sin commit) son recientes, y
+    # gc solo elimina objetos inalcanzables con más de dos semanas.
+    ret = subprocess.call(["git", "gc", "--auto", "--quiet"], cwd=repo.git_dir)
+    if ret != 0:
+        logger.warning("git gc --auto terminó con código %d", ret)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
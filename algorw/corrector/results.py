@@ -0,0 +1,148 @@
+"""Caché de resultados del worker para entregas idénticas.
+
+Es habitual que une alumne reenvíe exactamente el mismo ZIP (p.ej. si la
+página tardó en responder). En ese caso no hace falta volver a compilar y
+correr las pruebas: el resultado depende solo de los archivos de la entrega,
+de los archivos base del TP, y del binario del worker.
+
+Cada resultado se guarda en un archivo JSON en el directorio del caché,
+cuyo nombre es el hash de esas tres cosas. Periódicamente (ver entregas.ini)
+se borran, si se superan MAX_ENTRIES, los menos usados recientemente (según
+su mtime, que se actualiza en cada acierto). No se hace en cada put(), que
+tendría que listar el directorio entero.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+
+from typing import Iterable, Optional, Tuple
+
+
+__all__ = [
+    "ResultCache",
+    "file_hash",
+]
+
+MAX_ENTRIES = 5000
+
+Result = Tuple[str, int]
+
+
+class ResultCache:
+    def __init__(self, cache_dir: pathlib.Path, max_entries: int = MAX_ENTRIES):
+        self._dir = cache_dir
+        self._max_entries = max_entries
+
+    @staticmethod
+    def key(files: Iterable[Tuple[str, bytes]], *parts: str) -> str:
+        """Calcula la clave de una entrega.
+
+        Args:
+          files: pares (ruta, contenido) de los archivos de la entrega; el
+              orden no importa.
+          parts: el resto de identificadores del resultado (p.ej. el hash
+              de skel y del worker).
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(f"{part}\0".encode())
+        for path, data in sorted(files):
+            digest.update(f"{path}\0{len(data)}\0".encode())
+            digest.update(hashlib.sha256(data).digest())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Result]:
+        path = self._dir / f"{key}.json"
+        try:
+            with open(path) as entry:
+                result = json.load(entry)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return result["output"], result["retcode"]
+
+    def put(self, key: str, output: str, retcode: int) -> None:
+        self._dir.mkdir(parents=True, exist_ok=True)
+        fd, tmpname = tempfile.mkstemp(dir=self._dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as tmp:
+            json.dump({"output": output, "retcode": retcode}, tmp)
+        os.replace(tmpname, self._dir / f"{key}.json")
+
+    def evict(self) -> int:
+        """Borra los resultados menos usados por encima de `max_entries`.
+
+        Returns:
+          el número de resultados borrados.
+        """
+        try:
+            entries = [e for e in os.scandir(self._dir) if e.name.endswith(".json")]
+        except FileNotFoundError:
+            return 0
+        if len(entries) <= self._max_entries:
+            return 0
+
+        def mtime(entry):
+            try:
+                return entry.stat().st_mtime
+            except FileNotFoundError:
+                return 0
+
+        removed = 0
+        entries.sort(key=mtime)
+        for entry in entries[: len(entries) - self._max_entries]:
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+        return removed
+
+
+def file_hash(path: pathlib.Path, cache_dir: pathlib.Path) -> str:
+    """Hash del contenido de un archivo, recalculado solo si cambia su stat.
+
+    El hash se guarda en `cache_dir`, identificado por (ruta, tamaño, mtime):
+    el Worker de rq corre cada job en un proceso nuevo, por lo que un caché en
+    memoria no sobreviviría de un job al siguiente.
+    """
+    st = os.stat(path)
+    return _file_hash(str(path), st.st_size, st.st_mtime_ns, cache_dir)
+
+
+@functools.lru_cache(maxsize=None)
+def _file_hash(path: str, size: int, mtime_ns: int, cache_dir: pathlib.Path) -> str:
+    key = hashlib.sha256(f"{path}\0{size}\0{mtime_ns}".encode()).hexdigest()[:16]
+    name = os.path.basename(path)
+    hash_path = cache_dir / f"{name}-{key}.sha256"
+
+    try:
+        return hash_path.read_text()
+    except FileNotFoundError:
+        pass
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmpname = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "w") as tmp:
+        tmp.write(digest.hexdigest())
+    os.replace(tmpname, hash_path)
+
+    for old in cache_dir.glob(f"{name}-*.sha256"):
+        if old != hash_path:
+            old.unlink(missing_ok=True)
+
+    return digest.hexdigest()
+
+
+if __name__ == "__main__":
+    from .corrector import result_cache
+
+    print(f"{result_cache.evict()} resultados viejos borrados")
@@ -0,0 +1,135 @@
+"""Caché de los archivos base (skel) de cada TP, ya empaquetados en TAR.
+
+Para cada entrega, el worker recibe por entrada estándar un TAR con los
+archivos base del TP (subdirectorio "skel") seguidos de los de la entrega
+(subdirectorio "orig"). La parte de skel es siempre la misma para un mismo
+TP, así que se construye una única vez como fragmento de TAR (sin los
+bloques de fin de archivo) y se guarda en disco, identificada por la versión
+de skel (ver skel_version). Si se actualiza skel, cambia la versión y el
+fragmento se reconstruye automáticamente.
+
+Los fragmentos anteriores no se borran en el momento: otro worker puede
+haber obtenido su ruta y estar por abrirlo. Se los borra recién cuando
+pasaron SUPERSEDED_TTL segundos desde que se los reemplazó.
+"""
+
+import hashlib
+import os
+import pathlib
+import shutil
+import tarfile
+import tempfile
+import time
+
+from typing import BinaryIO
+
+import git  # type: ignore
+
+
+__all__ = [
+    "cached_tar",
+    "send_tar",
+    "skel_version",
+    "tree_hash",
+]
+
+# Tiempo durante el cual se conserva un fragmento reemplazado (más que el
+# timeout de cualquier job que pudiera estar usándolo).
+SUPERSEDED_TTL = 3600
+
+
+def skel_version(skel_dir: pathlib.Path) -> str:
+    """Identificador de la versión actual de los archivos de `skel_dir`.
+
+    Si skel está en un repositorio de Git, es el sha de HEAD (que se lee de
+    .git sin correr git, ni recorrer el árbol); si no, se usa tree_hash().
+    """
+    try:
+        repo = git.Repo(skel_dir, search_parent_directories=True)
+        sha = git.SymbolicReference.dereference_recursive(repo, "HEAD")
+    except (git.InvalidGitRepositoryError, git.NoSuchPathError, ValueError):
+        return tree_hash(skel_dir)
+    return sha[:16]
+
+
+def tree_hash(root: pathlib.Path) -> str:
+    """Hash de las rutas, tamaños y fechas de modificación de un árbol.
+
+    Se siguen los enlaces simbólicos, igual que al construir el TAR.
+    """
+    digest = hashlib.sha256()
+
+    for dirpath, dirnames, filenames in os.walk(root, followlinks=True):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            st = os.stat(path)
+            relpath = os.path.relpath(path, root)
+            digest.update(f"{relpath}\0{st.st_size}\0{st.st_mtime_ns}\0".encode())
+
+    return digest.hexdigest()[:16]
+
+
+def cached_tar(skel_dir: pathlib.Path, cache_dir: pathlib.Path) -> pathlib.Path:
+    """Devuelve la ruta al fragmento TAR con los archivos de `skel_dir`.
+
+    Si no existe en `cache_dir` un fragmento para la versión actual de skel,
+    se lo construye (y se borran los fragmentos viejos del mismo TP).
+    """
+    tar_path = cache_dir / f"{skel_dir.name}-{skel_version(skel_dir)}.tar"
+
+    if not tar_path.exists():
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmpname = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as tmp:
+            tar = tarfile.open(fileobj=tmp, mode="w", dereference=True)
+            for entry in sorted(os.scandir(skel_dir), key=lambda e: e.name):
+                tar.add(entry.path, f"skel/{entry.name}")
+            # Se descartan los bloques de fin de archivo que escribe close(),
+            # ya que a continuación van los archivos de la entrega.
+            end = tar.offset
+            tar.close()
+            tmp.truncate(end)
+        os.replace(tmpname, tar_path)
+        _remove_superseded(cache_dir, skel_dir.name)
+
+    return tar_path
+
+
+def _remove_superseded(cache_dir: pathlib.Path, name: str) -> None:
+    """Borra los fragmentos de un TP reemplazados hace más de SUPERSEDED_TTL.
+
+    Un fragmento fue reemplazado cuando se construyó el siguiente, así que
+    se lo borra solo si el siguiente (por fecha de modificación) es viejo.
+    """
+    fragments = []
+    # Con el largo exacto de la versión, para no incluir p.ej. "tp1-bis-*".
+    for path in cache_dir.glob(f"{name}-{'[0-9a-f]' * 16}.tar"):
+        try:
+            fragments.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            pass
+
+    fragments.sort()
+    deadline = time.time() - SUPERSEDED_TTL
+    for (_, old), (replaced_at, _) in zip(fragments, fragments[1:]):
+        if replaced_at < deadline:
+            old.unlink(missing_ok=True)
+
+
+def send_tar(tar_path: pathlib.Path, out: BinaryIO) -> None:
+    """Escribe un fragmento TAR en `out` (p.ej. el stdin del worker).
+
+    Se usa sendfile(2) para copiar sin pasar por memoria del proceso.
+    """
+    out.flush()
+    with open(tar_path, "rb") as src:
+        size = os.fstat(src.fileno()).st_size
+        offset = 0
+        try:
+            while offset < size:
+                offset += os.sendfile(out.fileno(), src.fileno(), offset, size - offset)
+        except OSError:
+            # Sin soporte de sendfile para este destino: copia con búfer grande.
+            src.seek(offset)
+            shutil.copyfileobj(src, out, 1024 * 1024)
@@ -0,0 +1,123 @@
+"""Métricas de tiempo y recursos de cada corrección.
+
+Cada job de corrección registra el tiempo que pasa en cada etapa (extraer
+el ZIP, correr el worker, guardar en el repositorio de entregas, sincronizar
+con Github, etc.), el uso de CPU y memoria del worker, y el tamaño de su
+salida. Los registros se agregan, uno por línea, a un archivo JSONL.
+
+Para ver percentiles por TP y por etapa:
+
+    python -m algorw.corrector.stats STATS_FILE [DÍAS]
+"""
+
+import collections
+import contextlib
+import json
+import math
+import os
+import pathlib
+import resource
+import sys
+import time
+
+from typing import Any, Dict, Iterator, List
+
+
+__all__ = [
+    "JobStats",
+]
+
+# Métricas, además de las etapas, de las que mostrar percentiles.
+METRICS = (
+    "cpu_user",
+    "maxrss_kb",
+    "output_bytes",
+    "github_calls",
+    "github_tree_entries",
+)
+
+
+class JobStats:
+    """Métricas de una corrección."""
+
+    def __init__(self, tp_id: str):
+        self.tp_id = tp_id
+        self.stages: Dict[str, float] = collections.defaultdict(float)
+        self.info: Dict[str, Any] = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Acumula en `name` el tiempo (de reloj) que tarda el bloque."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+    @contextlib.contextmanager
+    def child_usage(self) -> Iterator[None]:
+        """Registra CPU y memoria de los subprocesos terminados en el bloque."""
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        try:
+            yield
+        finally:
+            after = resource.getrusage(resource.RUSAGE_CHILDREN)
+            self.info["cpu_user"] = after.ru_utime - before.ru_utime
+            self.info["cpu_sys"] = after.ru_stime - before.ru_stime
+            # ru_maxrss (en KiB) es el máximo de todos los hijos, no un delta.
+            self.info["maxrss_kb"] = after.ru_maxrss
+
+    def save(self, path: pathlib.Path) -> None:
+        record = {
+            "ts": time.time(),
+            "tp": self.tp_id,
+            **self.info,
+            "stages": self.stages,
+        }
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        # Con O_APPEND y un único write(), las líneas de distintos procesos
+        # no se intercalan.
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano (values debe estar ordenada)."""
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+
+def main():
+    path = pathlib.Path(sys.argv[1])
+    since = time.time() - float(sys.argv[2]) * 86400 if len(sys.argv) > 2 else 0
+    samples: Dict[tuple, List[float]] = collections.defaultdict(list)
+
+    with open(path) as stats_file:
+        for line in stats_file:
+            record = json.loads(line)
+            if record["ts"] < since:
+                continue
+            tp_id = record["tp"]
+            stages = dict(record["stages"])
+            for metric in METRICS:
+                if metric in record:
+                    stages[metric] = record[metric]
+            for name, value in stages.items():
+                samples[(tp_id, name)].append(value)
+                samples[("*", name)].append(value)
+
+    columns = ("p50", "p90", "p95", "máx")
+    print(f"{'TP':<12} {'etapa':<14} {'n':>6} " + " ".join(f"{c:>10}" for c in columns))
+    for (tp_id, name), values in sorted(samples.items()):
+        values.sort()
+        pcts = [percentile(values, p) for p in (50, 90, 95, 100)]
+        print(
+            f"{tp_id:<12} {name:<14} {len(values):>6} "
+            + " ".join(f"{v:>10.3f}" for v in pcts)
+        )
+
+
+if __name__ == "__main__":
+    main()
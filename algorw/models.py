@@ -1,8 +1,7 @@
-from itertools import islice
 from logging import getLogger
-from typing import ClassVar, List, Optional, Sequence, Type, TypeVar
+from typing import ClassVar, Dict, FrozenSet, List, Optional, Sequence, Type, TypeVar
 
-from pydantic import BaseModel, EmailStr, ValidationError
+from pydantic.networks import validate_email
 
 from .common.models import Repo
 
@@ -11,6 +10,7 @@ __all__ = [
     "Model",
     "Alumne",
     "Docente",
+    "normalize_email",
     "parse_rows",
     "safeidx",
 ]
@@ -19,30 +19,67 @@ __all__ = [
 ModelT = TypeVar("ModelT", bound="Model")
 
 
-class Model(BaseModel):
+class Model:
     """Clase base para los objetos leídos de una planilla.
 
-    Esta clase define solamente la presencia de un variable de clase
-    COLUMNAS, que indica siempre el nombre de las columnas donde se
-    alojan los atributos del modelo.
+    Los modelos son objetos compactos (con __slots__), que se construyen en
+    bloque desde parse_rows(). Cada modelo define:
+
+      - __slots__: los atributos del modelo, en orden.
+      - COLUMNAS: el nombre de las columnas de donde leer los primeros
+        atributos de __slots__ (en el mismo orden).
+      - OBLIGATORIOS: los atributos que no pueden quedar vacíos.
+      - EMAILS: los atributos que deben ser una dirección de correo.
     """
 
+    __slots__: ClassVar[Sequence[str]] = ()
+
     COLUMNAS: ClassVar[Sequence[str]]
+    OBLIGATORIOS: ClassVar[FrozenSet[str]]
+    EMAILS: ClassVar[FrozenSet[str]] = frozenset()
+
+    def __init__(self, *args, **kwargs):
+        values = dict(zip(self.__slots__, args), **kwargs)
+        for attr in self.__slots__:
+            setattr(self, attr, values.get(attr))
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, a) == getattr(other, a) for a in self.__slots__)
+
+    def __repr__(self):
+        attrs = ", ".join(f"{a}={getattr(self, a)!r}" for a in self.__slots__)
+        return f"{type(self).__name__}({attrs})"
 
 
 class Docente(Model):
-    # https://pydantic-docs.helpmanual.io/usage/models/#field-ordering
+    __slots__ = ("nombre", "correo", "github")
+
     nombre: str
-    correo: EmailStr
+    correo: str
     github: Optional[str]
 
     COLUMNAS: ClassVar = ("Nombre", "Mail", "Github")
+    OBLIGATORIOS: ClassVar = frozenset({"nombre", "correo"})
+    EMAILS: ClassVar = frozenset({"correo"})
 
 
 class Alumne(Model):
+    __slots__ = (
+        "legajo",
+        "nombre",
+        "correo",
+        "github",
+        "grupo",
+        "repo_indiv",
+        "ayudante_indiv",
+        "ayudante_grupal",
+    )
+
     legajo: str
     nombre: str
-    correo: EmailStr
+    correo: str
     github: Optional[str]
     grupo: Optional[str]
     repo_indiv: Optional[Repo]
@@ -51,14 +88,16 @@ class Alumne(Model):
 
     # Deben cubrir todos los campos obligatorios, en el mismo orden.
     COLUMNAS: ClassVar = ("Padrón", "Alumno", "Email", "Github")
-
-    class Config:
-        arbitrary_types_allowed = True
+    OBLIGATORIOS: ClassVar = frozenset({"legajo", "nombre", "correo"})
+    EMAILS: ClassVar = frozenset({"correo"})
 
 
 def parse_rows(rows: List[List[str]], model: Type[ModelT]) -> List[ModelT]:
     """Construye objetos de una clase modelo a partir de filas de planilla.
 
+    Las columnas se buscan una sola vez, y la validación (campos obligatorios
+    y direcciones de correo) se hace por columna, no por fila.
+
     Argumentos:
       rows: lista de filas de la hoja. Se asume que la primera fila
           son los nombres de las columnas.
@@ -67,28 +106,64 @@ def parse_rows(rows: List[List[str]], model: Type[ModelT]) -> List[ModelT]:
 
     Returns:
       una lista de los objetos construidos.
+
+    Raises:
+      ValueError si alguna de las columnas del modelo no está en la hoja.
     """
     logger = getLogger(__name__)
-    fields = model.__fields__.keys()
-    indices = []
-    objects = []
     headers = rows[0]
+    indices = [headers.index(column) for column in model.COLUMNAS]
+    fields = model.__slots__[: len(indices)]
+
+    # Columnas de la hoja, convertidas a cadena (None si la celda está vacía).
+    columns = [
+        [None if (v := safeidx(row, idx)) is None else str(v) for row in rows[1:]]
+        for idx in indices
+    ]
+    errors: List[List[str]] = [[] for _ in range(len(rows) - 1)]
+
+    for field, values in zip(fields, columns):
+        if field in model.OBLIGATORIOS:
+            for i in (i for i, v in enumerate(values) if v is None):
+                errors[i].append(field)
+        if field in model.EMAILS:
+            # La validación es la de pydantic.EmailStr, una vez por dirección.
+            emails: Dict[str, Optional[str]] = {}
+            for i, v in enumerate(values):
+                if v is None:
+                    continue
+                if v not in emails:
+                    emails[v] = normalize_email(v)
+                if (email := emails[v]) is None:
+                    errors[i].append(field)
+                else:
+                    values[i] = email
 
-    for field in model.COLUMNAS:
-        indices.append(headers.index(field))
+    objects = []
 
-    for row in islice(rows, 1, None):
-        attrs = {field: safeidx(row, idx) for field, idx in zip(fields, indices)}
-        try:
-            objects.append(model.parse_obj(attrs))
-        except ValidationError as ex:
-            errors = ex.errors()
-            failed = ", ".join(e["loc"][0] for e in errors)
+    for i, values in enumerate(zip(*columns)):
+        if errors[i]:
+            attrs = dict(zip(fields, values))
+            failed = ", ".join(errors[i])
             logger.warning("ValidationError: %s in %s", failed, attrs)
+        else:
+            objects.append(model(*values))
 
     return objects
 
 
+def normalize_email(value: str) -> Optional[str]:
+    """Valida una dirección de correo como pydantic.EmailStr (sin DNS).
+
+    Returns:
+      la dirección normalizada (dominio en minúsculas), o None si no es válida.
+    """
+    try:
+        return validate_email(value)[1]
+    except ValueError:
+        return None
+
+
 def safeidx(lst, i):
     """Devuelve el índice i-ésimo (columna i-ésima)d e una lista (fila).
 
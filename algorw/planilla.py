@@ -1,5 +1,9 @@
+import gzip
+import hashlib
+import json
 import logging
 
+from dataclasses import dataclass
 from enum import Enum
 from itertools import islice
 from typing import Dict, List, Optional
@@ -10,10 +14,29 @@ from .sheets import PullDB
 
 
 __all__ = [
+    "JsonPayload",
     "Planilla",
 ]
 
 
+@dataclass(frozen=True)
+class JsonPayload:
+    """Un objeto ya serializado a JSON, comprimido y con su hash (para ETag)."""
+
+    data: bytes
+    gzipped: bytes
+    etag: str
+
+    @classmethod
+    def from_obj(cls, obj) -> "JsonPayload":
+        data = json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+        return cls(
+            data=data,
+            gzipped=gzip.compress(data),
+            etag=hashlib.sha256(data).hexdigest()[:32],
+        )
+
+
 class Hojas(str, Enum):
     Notas = "Notas"
     Repos = "Repos"
@@ -28,6 +51,7 @@ class Planilla(PullDB):
     """
 
     _correctores: Dict[str, List[str]]
+    _correctores_json: JsonPayload
     _alulist_by_id: Dict[str, List[Alumne]]
     _repos_by_group: Dict[str, Repo]
 
@@ -51,8 +75,8 @@ class Planilla(PullDB):
         # teniendo como valor su repositorio asociado.
         self._repos_by_group = self._parse_repos(sheet_dict[Hojas.Repos])
 
-        # correctores es un diccionario que se envía a index.html, y mapea
-        # legajos a un arreglo con:
+        # correctores es un diccionario que se envía a index.html (vía
+        # /correctores.json), y mapea legajos a un arreglo con:
         #
         #  • corrector individual
         #  • corrector grupal
@@ -78,10 +102,18 @@ class Planilla(PullDB):
                     # TODO: extraer de la hoja Repos los casos con más de un grupo.
                     self._correctores[alu.legajo].append(alu.grupo)
 
+        # Se serializa una única vez por planilla, y no en cada visita.
+        self._correctores_json = JsonPayload.from_obj(self._correctores)
+
     @property
     def correctores(self) -> Dict[str, List[str]]:
         return self._correctores.copy()
 
+    @property
+    def correctores_json(self) -> JsonPayload:
+        """El diccionario de correctores, listo para enviar al navegador."""
+        return self._correctores_json
+
     def get_alu(self, legajo: str) -> Alumne:
         """Lookup de alumne  por legajo.
 
@@ -101,6 +133,16 @@ class Planilla(PullDB):
         """Devuelve el Repositorio de un grupo, si lo hay."""
         return self._repos_by_group.get(id_grupo)
 
+    def repos(self) -> List[Repo]:
+        """Devuelve todos los repositorios, individuales y grupales, sin repetir."""
+        repos = {
+            alu.repo_indiv.full_name: alu.repo_indiv
+            for alu in self._alulist
+            if alu.repo_indiv is not None
+        }
+        repos.update((repo.full_name, repo) for repo in self._repos_by_group.values())
+        return list(repos.values())
+
     def _parse_notas(self, rows: List[List[str]]) -> Dict[str, List[Alumne]]:
         """Construye el mapeo de identificadores a alumnes.
 
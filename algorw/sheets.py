@@ -1,20 +1,45 @@
+import hashlib
+import logging
+import marshal
+import os
+import pathlib
+import tempfile
 import threading
+import time
 
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from googleapiclient import discovery  # type: ignore
+from googleapiclient.errors import HttpError  # type: ignore
 
 
 __all__ = ["Config", "PullDB"]
 
 
+# Versión del formato de los snapshots en disco (ver PullDB.load_snapshot).
+SNAPSHOT_FORMAT = 2
+
+SheetDict = Dict[str, List[List[str]]]
+
+
 @dataclass
 class Config:
     spreadsheet_id: str
     credentials: Dict
     sheet_list: List[str]
 
+    # Archivo donde guardar las hojas tras cada descarga.
+    snapshot_file: Optional[pathlib.Path] = None
+
+    # Si se consulta a Drive la fecha de modificación de la planilla antes
+    # de descargarla (requiere el scope drive.metadata.readonly).
+    check_revision: bool = False
+
+    # Como las fórmulas que importan datos de otras planillas no cambian la
+    # fecha de modificación, se descarga igualmente pasado este tiempo.
+    max_revision_age: float = 6 * 3600
+
 
 class PullDB:
     """Clase para descargar hojas de Google Sheets."""
@@ -24,6 +49,18 @@ class PullDB:
         self._lock = threading.Lock()
         self.__data = None
 
+        # Hojas descargadas, y hash de cada una (para detectar cambios).
+        self._sheets: Optional[SheetDict] = None
+        self._hashes: Dict[str, str] = {}
+
+        # Fecha de modificación en Drive de las hojas en uso, si se conoce.
+        self.revision: Optional[str] = None
+
+        # Momento (time.time) en que se descargaron las hojas en uso, y en
+        # que se verificó por última vez que siguen vigentes.
+        self.downloaded_at: Optional[float] = None
+        self.fetched_at: Optional[float] = None
+
         if initial_fetch:
             self.refresh()
 
@@ -36,11 +73,66 @@ class PullDB:
             self.refresh()
         return self.__data
 
-    def refresh(self):
+    def refresh(self) -> bool:
         """Descarga de Google las hojas que fueron configuradas en el constructor.
 
-        Si ya habían sido descargadas, se remplazan los datos anteriores con los nuevos.
+        Si ya habían sido descargadas, se remplazan los datos anteriores con los
+        nuevos. Antes de descargar, se consulta (si check_revision) la fecha de
+        modificación en Drive; y tras descargar, solo se vuelven a procesar las
+        hojas si su contenido cambió.
+
+        Returns:
+          True si cambiaron los datos, False si se confirmó que siguen vigentes.
         """
+        now = time.time()
+        revision = self._fetch_revision()
+
+        if (
+            self._sheets is not None
+            and revision is not None
+            and revision == self.revision
+            and now - (self.downloaded_at or 0) < self._cfg.max_revision_age
+        ):
+            changed = False
+            with self._lock:
+                self.fetched_at = now
+        else:
+            sheets = self._download()
+            changed = self._update(sheets, revision, now, now)
+
+        if self._cfg.snapshot_file is not None:
+            self._save_snapshot(self._cfg.snapshot_file)
+
+        return changed
+
+    def load_snapshot(self) -> bool:
+        """Carga las hojas guardadas en disco por el último refresh().
+
+        El snapshot guarda las filas tal cual las devolvió Google (con marshal,
+        que es compacto y rápido de leer), y se vuelven a procesar con
+        parse_sheets() solamente si cambiaron. Esto permite que un proceso nuevo
+        responda sin esperar a Google, para luego llamar a refresh() en segundo
+        plano.
+
+        Returns:
+          True si se cargó el snapshot; False si no existía o no era válido.
+        """
+        if (path := self._cfg.snapshot_file) is None:
+            return False
+        try:
+            with open(path, "rb") as snapshot:
+                fmt, spreadsheet_id, *state = marshal.load(snapshot)
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+
+        if fmt != SNAPSHOT_FORMAT or spreadsheet_id != self._cfg.spreadsheet_id:
+            return False
+
+        fetched_at, downloaded_at, revision, sheets = state
+        self._update(sheets, revision, downloaded_at, fetched_at)
+        return True
+
+    def _download(self) -> SheetDict:
         service = discovery.build("sheets", "v4", credentials=self._cfg.credentials)
         spreadsheets = service.spreadsheets()
         query = spreadsheets.values().batchGet(
@@ -49,11 +141,50 @@ class PullDB:
             valueRenderOption="UNFORMATTED_VALUE",
         )
         result = query.execute()
-        sheets = parse_sheets(result["valueRanges"])
-        new_data = self.parse_sheets(sheets)
-        if new_data is not None:
-            with self._lock:
+        return parse_sheets(result["valueRanges"])
+
+    def _fetch_revision(self) -> Optional[str]:
+        """Devuelve la fecha de modificación de la planilla según Drive."""
+        if not self._cfg.check_revision:
+            return None
+        try:
+            service = discovery.build("drive", "v3", credentials=self._cfg.credentials)
+            query = service.files().get(
+                fileId=self._cfg.spreadsheet_id, fields="modifiedTime"
+            )
+            return query.execute()["modifiedTime"]
+        except HttpError as ex:
+            logging.getLogger(__name__).warning("No se pudo consultar Drive: %s", ex)
+            return None
+
+    def _update(self, sheets: SheetDict, revision, downloaded_at, fetched_at) -> bool:
+        hashes = {
+            name: hashlib.sha256(marshal.dumps(rows)).hexdigest()
+            for name, rows in sheets.items()
+        }
+        changed = hashes != self._hashes
+        new_data = self.parse_sheets(sheets) if changed else None
+        with self._lock:
+            self._sheets, self._hashes = sheets, hashes
+            self.revision = revision
+            self.downloaded_at, self.fetched_at = downloaded_at, fetched_at
+            if new_data is not None:
                 self.__data = new_data
+        return changed
+
+    def _save_snapshot(self, path: pathlib.Path):
+        snapshot = (
+            SNAPSHOT_FORMAT,
+            self._cfg.spreadsheet_id,
+            self.fetched_at,
+            self.downloaded_at,
+            self.revision,
+            self._sheets,
+        )
+        fd, tmpname = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}")
+        with os.fdopen(fd, "wb") as tmp:
+            marshal.dump(snapshot, tmp)
+        os.replace(tmpname, path)
 
     def parse_sheets(self, sheet_dict):
         raise NotImplementedError
@@ -1,8 +1,16 @@
 from base64 import b64encode
 from email.message import Message
 from email.utils import parseaddr
-from smtplib import SMTP
-from typing import List
+from smtplib import (
+    SMTP,
+    SMTPAuthenticationError,
+    SMTPDataError,
+    SMTPException,
+    SMTPRecipientsRefused,
+    SMTPSenderRefused,
+    SMTPServerDisconnected,
+)
+from typing import Callable, Iterable, List, Optional, Tuple
 
 from google.auth.transport.requests import Request  # type: ignore
 from google.oauth2.credentials import Credentials  # type: ignore
@@ -10,18 +18,99 @@ from google.oauth2.credentials import Credentials  # type: ignore
 from config import Settings
 
 
-def sendmail(message: Message, creds: Credentials) -> None:
-    """Envía un mensaje usando el SMTP de Gmail."""
-    _, sender = parseaddr(message["From"])
-    xoauth2_tok = f"user={sender}\1" f"auth=Bearer {creds.token}\1\1"
-    xoauth2_b64 = b64encode(xoauth2_tok.encode("ascii")).decode("ascii")
-    server = SMTP("smtp.gmail.com", 587)
-    server.ehlo()
-    server.starttls()
-    server.ehlo()  # Se necesita EHLO de nuevo tras STARTTLS.
-    server.docmd("AUTH", "XOAUTH2 " + xoauth2_b64)
-    server.send_message(message)
-    server.close()
+class SMTPSender:
+    """Envía mensajes por SMTP reutilizando una misma sesión autenticada.
+
+    La conexión se abre en el primer envío y se mantiene abierta entre
+    llamadas; solo se vuelve a autenticar si cambia el token OAuth (o el
+    remitente), y se reconecta de manera transparente si el servidor cerró
+    la sesión por inactividad.
+
+    Args:
+      get_creds: función que devuelve credenciales válidas; se la invoca en cada
+          envío para detectar la rotación del token. Si devuelve None, no se
+          autentica (útil para probar contra un servidor SMTP local).
+      host, port: servidor SMTP.
+      starttls: si negociar STARTTLS antes de autenticar.
+    """
+
+    def __init__(
+        self,
+        get_creds: Callable[[], Optional[Credentials]],
+        *,
+        host: str = "smtp.gmail.com",
+        port: int = 587,
+        starttls: bool = True,
+    ):
+        self._get_creds = get_creds
+        self._host = host
+        self._port = port
+        self._starttls = starttls
+        self._server: Optional[SMTP] = None
+        self._session: Optional[Tuple[str, Optional[str]]] = None
+
+    def send(self, message: Message) -> None:
+        """Envía un mensaje, reutilizando la sesión SMTP si sigue abierta."""
+        _, sender = parseaddr(message["From"])
+        try:
+            self._connect(sender).send_message(message)
+        except (SMTPServerDisconnected, ConnectionError):
+            # Gmail cierra las sesiones inactivas; se reintenta una vez.
+            self.close()
+            self._connect(sender).send_message(message)
+
+    def send_many(self, messages: Iterable[Message]) -> List[Optional[SMTPException]]:
+        """Envía una serie de mensajes sobre la misma sesión SMTP.
+
+        Un mensaje rechazado por el servidor no impide enviar los siguientes;
+        los errores de conexión o de autenticación, en cambio, se propagan.
+
+        Returns:
+          para cada mensaje, None si se envió, o el error con que se rechazó.
+        """
+        errors: List[Optional[SMTPException]] = []
+        for message in messages:
+            try:
+                self.send(message)
+            except (SMTPRecipientsRefused, SMTPSenderRefused, SMTPDataError) as ex:
+                errors.append(ex)
+            else:
+                errors.append(None)
+        return errors
+
+    def close(self) -> None:
+        """Cierra la sesión SMTP, si la hay."""
+        server, self._server, self._session = self._server, None, None
+        if server is not None:
+            try:
+                server.quit()
+            except (SMTPException, OSError):
+                server.close()
+
+    def _connect(self, sender: str) -> SMTP:
+        creds = self._get_creds()
+        token = creds.token if creds is not None else None
+
+        if self._server is not None and self._session != (sender, token):
+            self.close()
+
+        if self._server is None:
+            server = SMTP(self._host, self._port)
+            server.ehlo()
+            if self._starttls:
+                server.starttls()
+                server.ehlo()  # Se necesita EHLO de nuevo tras STARTTLS.
+            if token is not None:
+                xoauth2_tok = f"user={sender}\1" f"auth=Bearer {token}\1\1"
+                xoauth2_b64 = b64encode(xoauth2_tok.encode("ascii")).decode("ascii")
+                code, resp = server.docmd("AUTH", "XOAUTH2 " + xoauth2_b64)
+                if code != 235:
+                    server.close()
+                    raise SMTPAuthenticationError(code, resp)
+            self._server = server
+            self._session = (sender, token)
+
+        return self._server
 
 
 def get_oauth_credentials(cfg: Settings) -> Credentials:
@@ -3,7 +3,8 @@ import os
 from datetime import timedelta
 from enum import Enum
 from functools import lru_cache
-from typing import Dict
+from pathlib import Path
+from typing import Dict, Optional
 
 import yaml
 
@@ -21,9 +22,20 @@ class Settings(BaseSettings):
     title: str
     sender: NameEmail
     job_queue: str = "default"
+    light_queue: str = "light"
+    # Procesos de corrección (por omisión, uno por CPU), y límite opcional
+    # de correcciones simultáneas por TP (ver algorw/corrector/pool.py).
+    corrector_workers: Optional[int] = None
+    tp_slots: Dict[str, int] = {}
+    mail_queue: str = "outbox"
+    blob_dir: Path = Path("blobs")
 
     spreadsheet_id: str
     planilla_ttl: timedelta
+    planilla_snapshot: Optional[Path] = Path("planilla.snapshot")
+    # Consultar en Drive si la planilla cambió antes de descargarla (requiere
+    # que la cuenta de servicio tenga el scope drive.metadata.readonly).
+    planilla_check_revision: bool = True
 
     cuatri: str
     entregas: Dict[str, Modalidad]  # TODO: introducir clase Entrega.
@@ -36,6 +48,17 @@ class Settings(BaseSettings):
     github_app_id: int
     github_app_keyfile: str
 
+    # Repositorio con el esqueleto de los repositorios de alumnes.
+    skel_repo: str = "algorw-alu/algo2_tps"
+
+    # Sincronizar varias entregas pendientes como un único commit.
+    sync_squash: bool = False
+
+    # Requests a la API de Github reservadas para tareas urgentes: si quedan
+    # menos, la sincronización de entregas se posterga hasta que se reinicie
+    # el límite (ver algorw/app/github_client.py).
+    github_reserve: int = 500
+
     # TODO: borrar este token cuando todo se migre a Github App.
     github_token: SecretStr
 
@@ -4,24 +4,22 @@ import logging
 import pathlib
 import zipfile
 
-from email import encoders
-from email.mime.base import MIMEBase
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.utils import formatdate, make_msgid
 from typing import List, Optional
 
-import github
-
 from flask import Flask, render_template, request
-from flask_caching import Cache  # type: ignore
 from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 
 from algorw import utils
-from algorw.app.queue import task_queue
-from algorw.common.tasks import CorrectorTask, RepoSync
-from algorw.corrector import corregir_entrega
+from algorw.app import outbox
+from algorw.app.queue import blob_store, correction_queue, light_queue
+from algorw.common import zipfiles
+from algorw.common.blobs import FAILURE_TTL
+from algorw.common.tasks import REPLY_HEADERS, CorrectorTask, RepoSync
+from algorw.corrector import JOB_TIMEOUT, corregir_entrega
 from algorw.models import Alumne, Docente
 from config import Modalidad, Settings, load_config
 from planilla import fetch_planilla, timer_planilla
@@ -32,14 +30,14 @@ app.logger.setLevel(logging.INFO)
 app.config["MAX_CONTENT_LENGTH"] = 4 * 1024 * 1024  # 4 MiB
 
 cfg: Settings = load_config()
-cache: Cache = Cache(config={"CACHE_TYPE": "simple"})
-
-cache.init_app(app)
 timer_planilla.start()
 
-File = collections.namedtuple("File", ["content", "filename"])
+File = collections.namedtuple("File", ["stream", "filename"])
 EXTENSIONES_ACEPTADAS = {"zip"}  # TODO: volver a aceptar archivos sueltos.
 
+# Tras cambiar la lista de entregas, la página puede tardar esto en reflejarlo.
+INDEX_MAX_AGE = 5 * 60
+
 
 class InvalidForm(Exception):
     """Excepción para cualquier error en el form."""
@@ -52,10 +50,39 @@ def inject_cfg():
 
 @app.route("/", methods=["GET"])
 def get():
-    planilla = fetch_planilla()
-    return render_template(
-        "index.html", entregas=cfg.entregas, correctores=planilla.correctores
-    )
+    """Devuelve el formulario de entregas.
+
+    La página solo depende de la configuración (la lista de correctores se
+    pide aparte), así que el navegador la cachea INDEX_MAX_AGE segundos, y
+    luego la revalida con If-None-Match.
+    """
+    response = app.make_response(render_template("index.html", entregas=cfg.entregas))
+    response.add_etag()
+    response.cache_control.max_age = INDEX_MAX_AGE
+    return response.make_conditional(request)
+
+
+@app.route("/correctores.json", methods=["GET"])
+def get_correctores():
+    """Devuelve el diccionario de correctores, pre-serializado por la planilla.
+
+    El navegador revalida siempre con If-None-Match, y recibe 304 mientras no
+    cambie la planilla.
+    """
+    payload = fetch_planilla().correctores_json
+
+    if request.if_none_match.contains_weak(payload.etag):
+        response = app.response_class(status=304)
+    elif "gzip" in request.accept_encodings:
+        response = app.response_class(payload.gzipped, mimetype="application/json")
+        response.content_encoding = "gzip"
+    else:
+        response = app.response_class(payload.data, mimetype="application/json")
+
+    response.set_etag(payload.etag, weak=True)
+    response.cache_control.no_cache = True
+    response.vary.add("Accept-Encoding")
+    return response
 
 
 @app.errorhandler(Exception)
@@ -82,9 +109,11 @@ def archivo_es_permitido(nombre):
 
 
 def get_files():
+    # Werkzeug ya guarda en un archivo temporal los adjuntos grandes; aquí
+    # se pasa ese stream tal cual, sin leerlo a memoria.
     files = request.files.getlist("files")
     return [
-        File(content=f.read(), filename=secure_filename(f.filename))
+        File(stream=f.stream, filename=secure_filename(f.filename))
         for f in files
         if f and archivo_es_permitido(f.filename)
     ]
@@ -124,23 +153,6 @@ def make_email(
     return correo
 
 
-def oauth_credentials():
-    """Caché de las credenciales OAuth."""
-    key = "oauth2_credentials"
-    creds = cache.get(key)
-
-    if creds is None:
-        app.logger.info("Loading OAuth2 credentials")
-    elif not creds.valid:
-        app.logger.info("Refreshing OAuth2 credentials")
-    else:
-        return creds
-
-    creds = utils.get_oauth_credentials(cfg)
-    cache.set(key, creds)
-    return creds
-
-
 @app.route("/", methods=["POST"])
 def post():
     # Leer valores del formulario.
@@ -205,18 +217,15 @@ def post():
         email.replace_header("Subject", email["Subject"] + " (ausencia)")
         with zipfile.ZipFile(rawzip, "w") as zf:
             zf.writestr("ausencia.txt", body + "\n")
-        entrega = File(rawzip.getvalue(), f"{tp}_ausencia.zip")
+        rawzip.seek(0)
+        entrega = File(rawzip, f"{tp}_ausencia.zip")
         commit_desc = ""
     else:
         entrega = zipfile_for_entrega(files)
         commit_desc = body.strip()
 
-    # Incluir el único archivo ZIP.
-    part = MIMEBase("application", "zip")
-    part.set_payload(entrega.content)
-    encoders.encode_base64(part)
-    part.add_header("Content-Disposition", "attachment", filename=entrega.filename)
-    email.attach(part)
+    # Única lectura a memoria del archivo, ya validado.
+    zip_bytes = entrega.stream.read()
 
     # Determinar la ruta en algo2_entregas (se hace caso especial para los parcialitos).
     tp_id = tp.lower()
@@ -229,40 +238,38 @@ def post():
         relpath_base = pathlib.PurePath("parcialitos") / cfg.cuatri / tp_id
 
     if alu_repo is not None:
-        # Crear este objeto cada vez para evitar
-        # https://github.com/PyGithub/PyGithub/issues/2431.
-        gh = github.GithubIntegration(
-            cfg.github_app_id, open(cfg.github_app_keyfile).read()
-        )
-        try:
-            installation = gh.get_repo_installation(alu_repo.owner, alu_repo.name)
-        except github.UnknownObjectException:
-            installation = gh.get_org_installation(alu_repo.owner)
-        auth = gh.get_access_token(installation.id)
-        auth_token = auth.token
-        repo_sync = RepoSync(
-            alu_repo=alu_repo,
-            auth_token=auth_token,
-            github_id=alumne.github or "wachenbot",
-        )
+        # El token de instalación lo obtiene el corrector al sincronizar.
+        repo_sync = RepoSync(alu_repo=alu_repo, github_id=alumne.github or "wachenbot")
     else:
         repo_sync = None
     task = CorrectorTask(
         tp_id=tp_id,
         legajos=legajos,
-        zipfile=entrega.content,
+        zip_digest=blob_store.put(zip_bytes),
         commit_desc=commit_desc,
         repo_sync=repo_sync,
-        orig_headers=dict(email.items()),
+        orig_headers={k: email[k] for k in REPLY_HEADERS if k in email},
         repo_relpath=relpath_base / "_".join(legajos),
     )
 
-    task_queue.enqueue(corregir_entrega, task)
+    # Las ausencias y los parcialitos se corrigen por una cola aparte, para que
+    # no esperen detrás de los TPs que se compilan y corren con Valgrind.
+    if tipo == "ausencia" or cfg.entregas[tp] == Modalidad.PARCIALITO:
+        queue = light_queue
+    else:
+        queue = correction_queue(task.tp_id)
+
+    # Si la corrección falla, el job (y su ZIP) se conserva FAILURE_TTL para
+    # poder reencolarlo (ver algorw/common/blobs.py).
+    queue.enqueue(
+        corregir_entrega, task, job_timeout=JOB_TIMEOUT, failure_ttl=FAILURE_TTL
+    )
 
     if not cfg.test:
-        # TODO: en lugar de enviar un mail, que es lento, hacer un commit en la
-        # copia local de algo2_entregas.
-        utils.sendmail(email, oauth_credentials())
+        # El envío por SMTP es lento; lo hace el worker de correo (ver outbox.py),
+        # que adjunta el ZIP desde el BlobStore (con su propia referencia).
+        attachment = outbox.Attachment(blob_store.put(zip_bytes), entrega.filename)
+        outbox.enqueue(email, attachment)
 
     return render_template(
         "result.html",
@@ -275,9 +282,9 @@ def post():
 def zipfile_for_entrega(files: List[File]) -> File:
     """Genera un archivo ZIP para enviar al corrector.
 
-    Por el momento, se reenvía tal cual el archivo recibido (debe haber solo uno).
+    Por el momento, se reenvía tal cual el archivo recibido (debe haber solo uno),
+    tras validarlo con las mismas reglas que usa el corrector en zip_walk().
     """
-    # TODO: realizar toda la validación aquí, y no en zip_walk().
     # TODO: si el archivo tiene subdirectorios o archivos no permitidos, crear un
     # nuevo ZIP, y enviar ese al corrector.
     assert EXTENSIONES_ACEPTADAS == {"zip"}
@@ -288,4 +295,14 @@ def zipfile_for_entrega(files: List[File]) -> File:
             f"Se esperaba un único archivo ZIP en la entrega (se encontró: {nombres})"
         )
 
-    return files[0]
+    entrega = files[0]
+    try:
+        with zipfile.ZipFile(entrega.stream) as zip_obj:
+            zipfiles.check_zip(zip_obj)
+    except zipfile.BadZipFile as ex:
+        raise InvalidForm(f"{entrega.filename} no es un archivo ZIP válido") from ex
+    except zipfiles.InvalidZip as ex:
+        raise InvalidForm(f"{entrega.filename}: {ex}") from ex
+
+    entrega.stream.seek(0)
+    return entrega
@@ -1,8 +1,13 @@
+import contextlib
+import copy
+import fcntl
 import logging
+import os
 import threading
 import time
 
-import cachetools.func  # type: ignore
+from functools import lru_cache
+from typing import Iterator, Optional
 
 from google.oauth2.service_account import Credentials  # type: ignore
 
@@ -16,35 +21,159 @@ __all__ = [
 ]
 
 cfg = load_config()
+logger = logging.getLogger("entregas")
 
+# La planilla que se sirve, y el mtime del snapshot del que se cargó (o que
+# se escribió al descargarla). Solo se reemplazan bajo _lock.
+_planilla: Optional[Planilla] = None
+_snapshot_mtime: Optional[int] = None
+_lock = threading.Lock()
 
-@cachetools.func.ttl_cache(maxsize=1, ttl=cfg.planilla_ttl.seconds)
-def fetch_planilla():
-    logging.getLogger("entregas").info("Fetching planilla")
+
+def fetch_planilla() -> Planilla:
+    """Devuelve la planilla en memoria (stale-while-revalidate).
+
+    Las peticiones nunca esperan a que se refresque la planilla: eso lo hace
+    background_fetch(). Solo la primera llamada de un proceso bloquea, y solo
+    si no hay un snapshot en disco del cual partir.
+    """
+    if _planilla is None:
+        with _lock:
+            if _planilla is None:
+                start = time.perf_counter()
+                if _load_snapshot():
+                    source = "cargada de snapshot"
+                else:
+                    _download(blocking=True)
+                    source = "descargada"
+                elapsed = (time.perf_counter() - start) * 1000
+                logger.info("Planilla %s en %.0f ms", source, elapsed)
+
+    assert _planilla is not None
+    return _planilla
+
+
+def revalidate() -> None:
+    """Actualiza la planilla en memoria, si corresponde.
+
+    Si otro proceso publicó un snapshot más reciente, se lo carga. Si la
+    planilla expiró (cfg.planilla_ttl), se la descarga de Google, pero solo
+    desde el proceso que obtenga el lock del snapshot; el resto de workers
+    la recibirá a través del snapshot en la siguiente revalidación.
+    """
+    with _lock:
+        if _stat_snapshot() != _snapshot_mtime:
+            _load_snapshot()
+        if _planilla is None or _expired(_planilla):
+            _download(blocking=False)
+
+
+def _load_snapshot() -> bool:
+    global _planilla, _snapshot_mtime
+
+    mtime = _stat_snapshot()
+    planilla = _new_planilla()
+    if mtime is None or not planilla.load_snapshot():
+        return False
+
+    _planilla, _snapshot_mtime = planilla, mtime
+    return True
+
+
+def _download(*, blocking: bool) -> None:
+    global _planilla, _snapshot_mtime
+
+    with _snapshot_lock(blocking=blocking) as acquired:
+        if not acquired:
+            return
+        # Otro proceso pudo haber publicado un snapshot mientras se esperaba.
+        if _stat_snapshot() != _snapshot_mtime:
+            _load_snapshot()
+        if _planilla is not None and not _expired(_planilla):
+            return
+        logger.info("Fetching planilla")
+        planilla = _new_planilla()
+        if not planilla.refresh():
+            logger.info("La planilla no cambió desde la última descarga")
+        _planilla, _snapshot_mtime = planilla, _stat_snapshot()
+
+
+def _new_planilla() -> Planilla:
+    """Objeto sobre el cual refrescar la planilla, sin modificar la que se sirve.
+
+    Se parte de una copia de la planilla actual para que, si las hojas no
+    cambiaron, no haga falta volver a procesarlas (ver PullDB.refresh).
+    """
+    if _planilla is not None:
+        return copy.copy(_planilla)
+    return Planilla(_sheets_config())
+
+
+def _expired(planilla: Planilla) -> bool:
+    age = time.time() - (planilla.fetched_at or 0)
+    return age >= cfg.planilla_ttl.total_seconds()
+
+
+def _stat_snapshot() -> Optional[int]:
+    if cfg.planilla_snapshot is None:
+        return None
+    try:
+        return os.stat(cfg.planilla_snapshot).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+@contextlib.contextmanager
+def _snapshot_lock(*, blocking: bool) -> Iterator[bool]:
+    """Lock entre procesos para descargar la planilla (uno por intervalo)."""
+    if cfg.planilla_snapshot is None:
+        yield True
+        return
+
+    lockfile = cfg.planilla_snapshot.with_name(cfg.planilla_snapshot.name + ".lock")
+    operation = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+
+    with open(lockfile, "a") as fd:
+        try:
+            fcntl.flock(fd, operation)
+        except BlockingIOError:
+            yield False
+        else:
+            try:
+                yield True
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+@lru_cache(maxsize=1)
+def _sheets_config() -> Config:
     credentials = Credentials.from_service_account_file(
         cfg.service_account_jsonfile,
-        scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"],
+        scopes=[
+            "https://www.googleapis.com/auth/spreadsheets.readonly",
+            "https://www.googleapis.com/auth/drive.metadata.readonly",
+        ],
     )
-    config = Config(
+    return Config(
         spreadsheet_id=cfg.spreadsheet_id,
         credentials=credentials,
         sheet_list=[hoja.value for hoja in Hojas],
+        snapshot_file=cfg.planilla_snapshot,
+        check_revision=cfg.planilla_check_revision,
     )
-    return Planilla(config, initial_fetch=True)
-
-
-# cachetools.ttl_cache nos asegura que jamás se use una planilla más
-# antigua de lo establecido. Sin embargo, de por sí, con ttl_cache
-# la planilla solo tiene oportunidad de refrescarse cuando se invoca
-# a la función. Por ello, es probable que muchas visitas demoren
-# por tener que recargar una planilla que se encontraba expirada.
-#
-# Para acercarnos al ideal de servir todas las peticiones desde cache,
-# lanzamos un hilo en segundo plano que, minuto a minuto, se asegure
-# de que se refresca si había expirado.
+
+
+# fetch_planilla() nunca refresca la planilla por sí misma: lo hace este hilo
+# en segundo plano que, minuto a minuto, revalida la planilla en memoria. Con
+# varios workers de uWSGI, solo uno de ellos descarga la planilla de Google
+# por cada intervalo de cfg.planilla_ttl (ver revalidate).
 def background_fetch():
     while True:
-        fetch_planilla()  # Thread-safe gracias a cachetools.ttl_cache.
+        try:
+            fetch_planilla()
+            revalidate()
+        except Exception:
+            logger.exception("Error al revalidar la planilla")
         time.sleep(55)
 
 
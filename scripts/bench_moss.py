@@ -0,0 +1,131 @@
+"""Benchmark de Moss contra un repositorio de entregas con mucha historia.
+
+Crea un repositorio con ENTREGAS entregas anteriores (con `git fast-import`,
+en un único commit), y mide el tiempo por entrega de:
+
+  - "porcelana": el método anterior a Moss sin índice (`git rm --cached`,
+    un `git add` por archivo, `git add .` y `git commit`);
+  - Moss, con los objetos sueltos, y luego empaquetados con `git gc`;
+  - Moss re-guardando entregas idénticas tras `git gc`: los blobs ya
+    existen (empaquetados) y no se deben volver a escribir.
+
+Ejecutar desde la raíz del repositorio:
+
+    python -m scripts.bench_moss [ENTREGAS] [REPETICIONES]
+"""
+
+import os
+import pathlib
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from pathlib import PurePath
+
+from algorw.corrector.moss import Moss
+
+
+FILES = {
+    "pila.c": b"#include <stdlib.h>\n" + b"int x;\n" * 400,
+    "pila.h": b"#pragma once\n" + b"void f(void);\n" * 40,
+    "pruebas_alumno.c": b"#include <stdio.h>\n" + b"int y;\n" * 200,
+}
+
+GIT_ENV = {
+    **os.environ,
+    "GIT_AUTHOR_NAME": "bench",
+    "GIT_AUTHOR_EMAIL": "bench@example.com",
+    "GIT_COMMITTER_NAME": "bench",
+    "GIT_COMMITTER_EMAIL": "bench@example.com",
+}
+
+
+def git(root, *args, **kwargs):
+    return subprocess.run(
+        ["git", *args], cwd=root, env=GIT_ENV, check=True, **kwargs
+    ).stdout
+
+
+def relpath(i: int) -> PurePath:
+    return PurePath(f"tp{i % 4}") / "2020_1" / f"{100000 + i}"
+
+
+def make_history(root: pathlib.Path, entregas: int) -> None:
+    """Crea el repositorio con `entregas` entregas en un único commit."""
+    git(root, "init", "-q")
+    stream = [b"commit refs/heads/master\n"]
+    stream.append(b"committer bench <bench@example.com> 1577836800 +0000\n")
+    stream.append(b"data 7\nhistory\n")
+    for i in range(entregas):
+        for name, data in FILES.items():
+            # Cada entrega difiere de las demás en su primera línea.
+            data = b"/* %d */\n" % i + data
+            path = (relpath(i) / name).as_posix().encode()
+            stream.append(b"M 100644 inline %s\n" % path)
+            stream.append(b"data %d\n%s\n" % (len(data), data))
+    git(root, "fast-import", "--quiet", input=b"".join(stream))
+    git(root, "checkout", "-q", "-f", "master")
+
+
+def porcelana(root: pathlib.Path, i: int) -> None:
+    dest = root / relpath(i)
+    git(root, "rm", "--cached", "-r", "-q", "--ignore-unmatch", str(relpath(i)))
+    shutil.rmtree(dest, ignore_errors=True)
+    dest.mkdir(parents=True)
+    for name, data in FILES.items():
+        (dest / name).write_bytes(b"/* nueva %d */\n" % i + data)
+        git(root, "add", str(dest / name))
+    git(root, "add", "--no-ignore-removal", ".")
+    git(root, "commit", "-q", "-m", f"New upload {i}")
+
+
+def moss(root: pathlib.Path, i: int, prefix: bytes) -> None:
+    entrega = Moss(root, relpath(i), "https://github.com/bench/entregas")
+    for name, data in FILES.items():
+        entrega.save_data(name, prefix % i + data)
+    entrega.save_output("Todo OK\n")
+    entrega.commit_emoji("Todo OK\n")
+    entrega.flush(f"New upload {i}", "2020-01-02T00:00:00")
+
+
+def loose_objects(root: pathlib.Path) -> int:
+    return int(git(root, "count-objects", capture_output=True).split()[0])
+
+
+def bench(name, func, reps):
+    times = []
+    for i in range(reps):
+        start = time.perf_counter()
+        func(i)
+        times.append(time.perf_counter() - start)
+    print(f"{name:<28} {statistics.median(times) * 1000:8.1f} ms/entrega")
+
+
+def main(entregas, reps):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = pathlib.Path(tmpdir)
+        start = time.perf_counter()
+        make_history(root, entregas)
+        print(f"historia: {entregas} entregas en {time.perf_counter() - start:.1f} s")
+
+        bench("porcelana", lambda i: porcelana(root, i), reps)
+        bench("moss (objetos sueltos)", lambda i: moss(root, i, b"/* m %d */\n"), reps)
+
+        git(root, "gc", "-q")
+        bench("moss (empaquetado)", lambda i: moss(root, i, b"/* gc %d */\n"), reps)
+
+        # Las mismas entregas otra vez: solo se escriben árboles y commits.
+        git(root, "gc", "-q")
+        before = loose_objects(root)
+        bench("moss (idénticas)", lambda i: moss(root, i, b"/* gc %d */\n"), reps)
+        written = (loose_objects(root) - before) / reps
+        print(f"objetos escritos por entrega idéntica: {written:.1f}")
+
+
+if __name__ == "__main__":
+    entregas = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    reps = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    main(entregas, reps)
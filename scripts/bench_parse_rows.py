@@ -0,0 +1,72 @@
+"""Benchmark de la lectura de la planilla (algorw.models.parse_rows).
+
+Genera hojas sintéticas de alumnes con FILAS filas (por omisión, 5.000 y
+50.000), con una fracción de filas inválidas (correo mal formado o campos
+obligatorios vacíos), y mide el tiempo de parse_rows() y la memoria que
+retienen los objetos construidos.
+
+Ejecutar desde la raíz del repositorio:
+
+    python -m scripts.bench_parse_rows [FILAS...]
+"""
+
+import logging
+import statistics
+import sys
+import time
+import tracemalloc
+
+from algorw.models import Alumne, parse_rows
+
+
+HEADERS = ["Padrón", "Alumno", "Email", "Github", "Notas"]
+
+# Una de cada INVALID_EVERY filas no pasa la validación.
+INVALID_EVERY = 50
+
+
+def make_rows(n):
+    rows = [HEADERS]
+    for i in range(n):
+        legajo = str(100000 + i)
+        correo = f"alumne{i}@fi.uba.ar"
+        if i % INVALID_EVERY == 1:
+            correo = "sin arroba"
+        elif i % INVALID_EVERY == 2:
+            legajo = ""
+        # Las filas de Sheets omiten las celdas vacías del final.
+        github = [f"alu{i}"] if i % 3 else []
+        rows.append([legajo, f"Apellido{i}, Nombre", correo, *github])
+    return rows
+
+
+def bench(n, reps):
+    rows = make_rows(n)
+    times = []
+    for _ in range(reps):
+        start = time.perf_counter()
+        alumnes = parse_rows(rows, Alumne)
+        times.append(time.perf_counter() - start)
+
+    del alumnes
+    tracemalloc.start()
+    alumnes = parse_rows(rows, Alumne)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"filas={n:<6} válidas={len(alumnes):<6} "
+        f"tiempo={statistics.median(times) * 1000:7.1f} ms "
+        f"retenido={retained / 2**20:6.1f} MiB pico={peak / 2**20:6.1f} MiB"
+    )
+
+
+def main(sizes, reps=5):
+    # Los warnings de las filas inválidas no son parte de lo que se mide.
+    logging.disable(logging.WARNING)
+    for n in sizes:
+        bench(n, reps)
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [5000, 50000])
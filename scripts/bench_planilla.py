@@ -0,0 +1,107 @@
+"""Benchmark del arranque en frío de fetch_planilla() (planilla.py).
+
+Con una planilla de FILAS alumnes servida por scripts/fake_sheets.py, mide
+cuánto tarda la primera llamada a fetch_planilla() de un proceso:
+
+  - sin snapshot en disco (descarga y procesa la planilla);
+  - con un snapshot reciente (lo escribe la descarga anterior).
+
+Como la imitación de Sheets responde al instante, se puede sumar una demora
+de LATENCIA_MS a cada llamada a la API, para aproximar la de Google.
+
+Ejecutar desde la raíz del repositorio:
+
+    python -m scripts.bench_planilla [FILAS] [LATENCIA_MS]
+"""
+
+import logging
+import statistics
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+from unittest import mock
+
+import planilla
+
+from algorw.planilla import Hojas
+from algorw.sheets import Config
+from scripts.fake_sheets import FakeSheets
+
+
+SPREADSHEET_ID = "planilla_bench"
+REPS = 5
+
+
+def make_sheets(n):
+    docentes = [["Nombre", "Mail", "Github"]]
+    docentes += [[f"Docente {i}", f"docente{i}@fi.uba.ar", ""] for i in range(20)]
+    alumnos = [["Padrón", "Alumno", "Email", "Github"]]
+    notas = [["Padrón", "Nro Grupo", "Ayudante", "Ayudante grupo"]]
+    repos = [["Legajo", "Grupo", "Repo", "Repo2"]]
+    for i in range(n):
+        legajo, grupo = str(100000 + i), f"G{i // 2}"
+        alumnos.append([legajo, f"Apellido{i}, Nombre", f"alu{i}@fi.uba.ar", f"a{i}"])
+        notas.append([legajo, grupo, f"Docente {i % 20}", f"Docente {i // 2 % 20}"])
+        repos.append([legajo, grupo, f"fiuba/alu{i}", f"fiuba/{grupo}"])
+    return {
+        Hojas.Notas.value: notas,
+        Hojas.Repos.value: repos,
+        Hojas.Alumnes.value: alumnos,
+        Hojas.Docentes.value: docentes,
+    }
+
+
+def first_fetch():
+    """Tiempo de la primera llamada a fetch_planilla() en un proceso nuevo."""
+    planilla._planilla = planilla._snapshot_mtime = None
+    start = time.perf_counter()
+    planilla.fetch_planilla()
+    return time.perf_counter() - start
+
+
+def bench(name, reps, setup):
+    times = []
+    for _ in range(reps):
+        setup()
+        times.append(first_fetch())
+    print(f"{name:<20} {statistics.median(times) * 1000:8.1f} ms")
+
+
+def main(n, latency_ms):
+    fake = FakeSheets(SPREADSHEET_ID, make_sheets(n))
+    for method in ("batch_get", "get_file"):
+        orig = getattr(fake, method)
+        setattr(fake, method, _delayed(orig, latency_ms / 1000))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        snapshot = Path(tmpdir) / "planilla.snapshot"
+        config = Config(
+            SPREADSHEET_ID,
+            {},
+            [hoja.value for hoja in Hojas],
+            snapshot_file=snapshot,
+            check_revision=True,
+        )
+        with fake.patch(), mock.patch.multiple(
+            planilla, _sheets_config=lambda: config
+        ), mock.patch.object(planilla.cfg, "planilla_snapshot", snapshot):
+            bench("sin snapshot", REPS, lambda: snapshot.unlink(missing_ok=True))
+            planilla.fetch_planilla()
+            bench("con snapshot", REPS, lambda: None)
+
+
+def _delayed(func, secs):
+    def wrapper(*args, **kwargs):
+        time.sleep(secs)
+        return func(*args, **kwargs)
+
+    return wrapper
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 0
+    main(n, latency_ms)
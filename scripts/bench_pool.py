@@ -0,0 +1,92 @@
+"""Benchmark del supervisor de corrección (algorw/corrector/pool.py).
+
+Encola JOBS correcciones falsas, cada una de las cuales corre un "worker"
+que consume CPU durante SECS segundos, y mide el throughput y los tiempos
+de respuesta (desde que se encola hasta que termina) para distintas
+cantidades de workers. Las correcciones se reparten entre dos TPs, uno de
+ellos con límite de correcciones simultáneas (ver TP_SLOTS).
+
+Requiere Redis. Ejecutar desde la raíz del repositorio:
+
+    python -m scripts.bench_pool [JOBS] [SECS] [WORKERS...]
+"""
+
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+from rq import Queue  # type: ignore
+
+from algorw.app.queue import redis_conn
+
+# Worker falso: lee el TAR de stdin, y consume CPU como lo haría Valgrind.
+FAKE_WORKER = "cat >/dev/null; end=$(($(date +%s%N) + {ns})); \
+while [ $(date +%s%N) -lt $end ]; do :; done; echo 'Todo OK'"
+
+TP_SLOTS = '{"pesado": 2}'
+QUEUE = "bench_pool"
+JOB_FUNC = "scripts.bench_pool.fake_correction"
+
+
+def fake_correction(secs, enqueued_at):
+    """Corrección falsa; devuelve el tiempo de respuesta."""
+    subprocess.run(
+        ["sh", "-c", FAKE_WORKER.format(ns=int(secs * 1e9))],
+        input=b"",
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    return time.time() - enqueued_at
+
+
+def run(jobs, secs, workers):
+    # Como algorw.app.queue.correction_queue(), con JOB_QUEUE=QUEUE.
+    queues = {
+        "liviano": Queue(QUEUE, connection=redis_conn),
+        "pesado": Queue(f"{QUEUE}_pesado", connection=redis_conn),
+    }
+    for queue in queues.values():
+        queue.empty()
+        redis_conn.delete(queue.finished_job_registry.key)
+
+    env = dict(os.environ, JOB_QUEUE=QUEUE, TP_SLOTS=TP_SLOTS)
+    supervisor = subprocess.Popen(
+        [sys.executable, "-m", "algorw.corrector.pool", str(workers)], env=env
+    )
+    start = time.time()
+    for i in range(jobs):
+        tp_id = "pesado" if i % 4 == 0 else "liviano"
+        queues[tp_id].enqueue(JOB_FUNC, secs, time.time())
+
+    while len(turnaround := _results(queues.values())) < jobs:
+        time.sleep(0.2)
+    elapsed = time.time() - start
+
+    supervisor.send_signal(signal.SIGTERM)
+    supervisor.wait()
+
+    p95 = statistics.quantiles(turnaround, n=20)[-1]
+    print(
+        f"workers={workers:<3d} throughput={jobs / elapsed:6.2f} jobs/s "
+        f"p50={statistics.median(turnaround):6.2f}s p95={p95:6.2f}s"
+    )
+
+
+def _results(queues):
+    results = []
+    for queue in queues:
+        job_ids = queue.finished_job_registry.get_job_ids()
+        jobs = queue.job_class.fetch_many(job_ids, queue.connection)
+        results += [job.result for job in jobs if job is not None]
+    return results
+
+
+if __name__ == "__main__":
+    args = [float(arg) for arg in sys.argv[1:]]
+    jobs = int(args[0]) if args else 100
+    secs = args[1] if len(args) > 1 else 0.5
+    for n in args[2:] or [1, 2, os.cpu_count() or 1]:
+        run(jobs, secs, int(n))
@@ -0,0 +1,88 @@
+"""Benchmark de PullDB.refresh contra una imitación local de Sheets y Drive.
+
+Con una planilla de FILAS alumnes (más una hoja chica de docentes), mide
+cuántas descargas y cuántos re-procesamientos de hojas hace refresh() en
+cada escenario:
+
+  - primera descarga;
+  - planilla sin cambios (solo se consulta la fecha de Drive);
+  - fecha de Drive nueva, pero mismas filas (se descarga, no se procesa);
+  - cambia una hoja (se descarga y se procesa);
+  - sin check_revision (se descarga siempre).
+
+Ejecutar desde la raíz del repositorio:
+
+    python -m scripts.bench_sheets [FILAS]
+"""
+
+import collections
+import sys
+import time
+
+from algorw.models import Alumne, Docente, parse_rows
+from algorw.sheets import Config, PullDB
+from scripts.fake_sheets import FakeSheets
+
+
+SPREADSHEET_ID = "planilla_bench"
+
+
+class BenchDB(PullDB):
+    parsed: collections.Counter = collections.Counter()
+
+    def parse_sheets(self, sheet_dict):
+        self.parsed["parse_sheets"] += 1
+        return (
+            parse_rows(sheet_dict["Alumnos"], Alumne),
+            parse_rows(sheet_dict["Docentes"], Docente),
+        )
+
+
+def make_sheets(n):
+    alumnos = [["Padrón", "Alumno", "Email", "Github"]]
+    alumnos += [
+        [str(100000 + i), f"Apellido{i}, Nombre", f"alumne{i}@fi.uba.ar", f"alu{i}"]
+        for i in range(n)
+    ]
+    docentes = [["Nombre", "Mail", "Github"]]
+    docentes += [[f"Docente {i}", f"docente{i}@fi.uba.ar", ""] for i in range(20)]
+    return {"Alumnos": alumnos, "Docentes": docentes}
+
+
+def step(name, fake, db):
+    fake.stats.clear()
+    db.parsed.clear()
+    start = time.perf_counter()
+    changed = db.refresh()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<28} cambió={changed!s:<5} "
+        f"drive={fake.stats['files.get']} sheets={fake.stats['batchGet']} "
+        f"procesadas={db.parsed['parse_sheets']} "
+        f"tiempo={elapsed * 1000:7.1f} ms"
+    )
+
+
+def main(n):
+    sheets = make_sheets(n)
+    fake = FakeSheets(SPREADSHEET_ID, sheets)
+    cfg = Config(SPREADSHEET_ID, {}, list(sheets), check_revision=True)
+
+    with fake.patch():
+        db = BenchDB(cfg)
+        step("primera descarga", fake, db)
+        step("sin cambios", fake, db)
+
+        fake.touch()
+        step("fecha nueva, mismas filas", fake, db)
+
+        docentes = sheets["Docentes"] + [["Docente nuevo", "nuevo@fi.uba.ar", ""]]
+        fake.update("Docentes", docentes)
+        step("cambia una hoja", fake, db)
+
+        cfg.check_revision = False
+        step("sin check_revision", fake, db)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,145 @@
+"""Benchmark del envío de correo contra un servidor SMTP local.
+
+Levanta un servidor SMTP mínimo en localhost que simula, con una demora
+fija por conexión (HANDSHAKE_MS), el costo de conectarse a smtp.gmail.com
+y negociar STARTTLS y XOAUTH2; y mide cuántos mensajes por segundo se
+envían:
+
+  - con SMTPSender, abriendo una conexión por mensaje (como hacía el
+    antiguo `utils.sendmail`), y en lote con SMTPSender.send_many();
+
+  - a través del outbox: se encolan los mensajes en una cola de rq, y se
+    los envía con un SimpleWorker (como el de entregas.ini), primero de a
+    un mensaje por job y luego en lotes de hasta outbox.MAX_BATCH.
+
+Requiere Redis. Ejecutar desde la raíz del repositorio:
+
+    python -m scripts.bench_smtp [MENSAJES] [HANDSHAKE_MS]
+"""
+
+import socketserver
+import sys
+import threading
+import time
+
+from email.mime.text import MIMEText
+from email.utils import make_msgid
+
+from rq import Queue, SimpleWorker  # type: ignore
+
+from algorw.app import outbox
+from algorw.app.queue import redis_conn
+from algorw.utils import SMTPSender
+
+
+QUEUE = "bench_smtp"
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """Servidor SMTP que acepta (y descarta) todos los mensajes."""
+
+    def handle(self):
+        time.sleep(self.server.handshake)
+        self.reply("220 localhost ESMTP bench")
+        while line := self.rfile.readline():
+            verb = line.split(b" ", 1)[0].strip().upper()
+            if verb == b"EHLO":
+                self.reply("250-localhost", "250 8BITMIME")
+            elif verb == b"DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.server.received += 1
+                self.reply("250 OK")
+            elif verb == b"QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+    def reply(self, *lines):
+        self.wfile.write("".join(f"{x}\r\n" for x in lines).encode("ascii"))
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake: float):
+        super().__init__(("127.0.0.1", 0), FakeSMTPHandler)
+        self.handshake = handshake
+        self.received = 0
+
+    def start(self) -> int:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address[1]
+
+
+def make_message(i: int) -> MIMEText:
+    message = MIMEText(f"Entrega {i}\n" + "x" * 2000, "plain")
+    message["From"] = "Entregas <entregas@example.com>"
+    message["To"] = "alumne@example.com"
+    message["Subject"] = f"TP{i}"
+    message["Message-ID"] = make_msgid("bench", "example.com")
+    return message
+
+
+def report(name: str, messages: int, elapsed: float) -> None:
+    print(f"{name:<28} {messages / elapsed:8.1f} mensajes/s")
+
+
+def bench_sender(port: int, messages: int) -> None:
+    sender = SMTPSender(lambda: None, host="127.0.0.1", port=port, starttls=False)
+
+    start = time.perf_counter()
+    for i in range(messages):
+        sender.send(make_message(i))
+        sender.close()
+    report("conexión por mensaje", messages, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    errors = sender.send_many(make_message(i) for i in range(messages))
+    sender.close()
+    report("send_many", messages, time.perf_counter() - start)
+    assert not any(errors), errors
+
+
+def bench_outbox(name: str, port: int, messages: int, batch: int) -> None:
+    queue = Queue(QUEUE, connection=redis_conn)
+    queue.empty()
+    outbox.mail_queue = queue
+    outbox.MAX_BATCH = batch
+    outbox._sender = SMTPSender(
+        lambda: None, host="127.0.0.1", port=port, starttls=False
+    )
+    for i in range(messages):
+        outbox.enqueue(make_message(i))
+
+    start = time.perf_counter()
+    worker = SimpleWorker([queue], connection=redis_conn)
+    worker.work(burst=True, logging_level="WARNING")
+    report(name, messages, time.perf_counter() - start)
+    outbox._sender.close()
+
+    finished = queue.finished_job_registry.get_job_ids()
+    assert len(finished) == messages, f"{len(finished)} jobs terminados"
+    queue.finished_job_registry.cleanup(timestamp=time.time() + 1000)
+
+
+def main(messages: int, handshake_ms: float) -> None:
+    server = FakeSMTPServer(handshake_ms / 1000)
+    port = server.start()
+    max_batch = outbox.MAX_BATCH
+
+    bench_sender(port, messages)
+    bench_outbox("outbox, un mensaje por job", port, messages, batch=1)
+    bench_outbox("outbox, en lote", port, messages, batch=max_batch)
+
+    assert server.received == 4 * messages, server.received
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    handshake_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 50
+    main(messages, handshake_ms)
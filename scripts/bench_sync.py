@@ -0,0 +1,80 @@
+"""Benchmark de AluRepo.sync contra una imitación local de Github.
+
+Crea un repositorio de entregas temporal con PENDIENTES entregas de un TP
+sin sincronizar (cada una cambiando un solo archivo), y mide cuántas
+requests y cuántos bytes necesita sync() para subirlas, con y sin squash.
+
+Requiere Redis (para el caché de árboles). Ejecutar desde la raíz del
+repositorio:
+
+    python -m scripts.bench_sync [PENDIENTES]
+"""
+
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+from algorw.app.queue import redis_conn
+from algorw.corrector.alu_repos import AluRepo
+from scripts.fake_github import FakeGithub
+
+
+SKEL = {f"pila/pruebas{i}.c": b"/* pruebas */\n" * 200 for i in range(5)}
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "bench",
+    "GIT_AUTHOR_EMAIL": "bench@example.com",
+    "GIT_COMMITTER_NAME": "bench",
+    "GIT_COMMITTER_EMAIL": "bench@example.com",
+    "PATH": os.environ["PATH"],
+}
+
+
+def make_entregas(root: pathlib.Path, pending: int) -> pathlib.Path:
+    entrega = root / "pila" / "2020_2" / "12345"
+    entrega.mkdir(parents=True)
+    subprocess.run(["git", "init", "-q"], cwd=root, check=True)
+    for i in range(pending):
+        for name, data in SKEL.items():
+            (entrega / pathlib.PurePath(name).name).write_bytes(data)
+        (entrega / "pila.c").write_text(f"/* versión {i} */\n" + "int x;\n" * 300)
+        subprocess.run(["git", "add", "-A"], cwd=root, check=True)
+        subprocess.run(
+            ["git", "commit", "-qm", f"New pila upload from 12345 ({i})"],
+            cwd=root,
+            check=True,
+            env=GIT_ENV,
+        )
+    return entrega
+
+
+def run(pending: int, squash: bool) -> None:
+    fake = FakeGithub("algorw-alu/algo2_bench")
+    fake.seed_branch("main", {"README.md": b"algo2\n", **SKEL})
+    fake.seed_branch("pila", {"README.md": b"algo2\n", **SKEL})
+    alu_repo = AluRepo(fake.repo_full, auth_token="x", api_url=fake.start())
+    for key in redis_conn.scan_iter("github:tree:*"):
+        redis_conn.delete(key)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        entrega = make_entregas(pathlib.Path(tmpdir), pending)
+        start = time.perf_counter()
+        alu_repo.sync(entrega, "pila", "bench", {"name": "Pruebas"}, squash=squash)
+        elapsed = time.perf_counter() - start
+
+    print(
+        f"pendientes={pending} squash={squash!s:<5} "
+        f"requests={fake.stats['requests']:<3} "
+        f"enviados={fake.stats['bytes_in'] / 1024:6.1f} KiB "
+        f"recibidos={fake.stats['bytes_out'] / 1024:6.1f} KiB "
+        f"tiempo={elapsed * 1000:6.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    pending = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    run(pending, squash=False)
+    run(pending, squash=True)
@@ -0,0 +1,70 @@
+"""Benchmark de la lectura de entregas (algorw.common.zipfiles).
+
+Mide, para un ZIP con muchos archivos pequeños y otro con pocos archivos
+grandes, el tiempo de validar, recorrer y descomprimir la entrega; y
+verifica que un ZIP bomb se rechace sin descomprimirlo.
+
+Ejecutar desde la raíz del repositorio:
+
+    python -m scripts.bench_zip_walk [REPETICIONES]
+"""
+
+import io
+import os
+import sys
+import time
+import zipfile
+
+from algorw.common import zipfiles
+
+
+def make_zip(files):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in files:
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def read_all(zip_bytes):
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zip_obj:
+        return sum(
+            len(zipfiles.read_member(zip_obj, info))
+            for _, info in zipfiles.walk(zip_obj)
+        )
+
+
+def bench(name, zip_bytes, reps):
+    start = time.perf_counter()
+    for _ in range(reps):
+        size = read_all(zip_bytes)
+    elapsed = (time.perf_counter() - start) / reps
+    print(
+        f"{name:<12} {len(zip_bytes) / 1024:>8.0f} KiB → {size / 1024:>8.0f} KiB "
+        f"{elapsed * 1000:>8.2f} ms"
+    )
+
+
+def main(reps):
+    source = b"int main(void) {\n    return 0;\n}\n" * 20
+    many = make_zip(
+        (f"entrega/src/mod{i // 50}/archivo{i}.c", source) for i in range(900)
+    )
+    large = make_zip(
+        (f"entrega/datos{i}.txt", os.urandom(3 * 1024 * 1024)) for i in range(4)
+    )
+    bomb = make_zip([("entrega/bomba.txt", b"\0" * (zipfiles.MAX_FILE_SIZE - 1))])
+
+    bench("muchos", many, reps)
+    bench("grandes", large, reps)
+
+    start = time.perf_counter()
+    try:
+        read_all(bomb)
+    except zipfiles.InvalidZip as ex:
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{'bomba':<12} rechazado en {elapsed:.2f} ms: {ex}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,78 @@
+"""Verifica que parse_rows() valide los correos igual que pydantic.EmailStr.
+
+Los modelos de la planilla (algorw.models) ya no son modelos de pydantic,
+pero la validación de correos debe seguir aceptando y rechazando las mismas
+direcciones que EmailStr, con la misma normalización. Entre los casos están
+los que aceptaba una expresión regular más laxa (puntos consecutivos,
+dominios inválidos, etc.).
+
+Ejecutar desde la raíz del repositorio:
+
+    python -m scripts.check_emails
+"""
+
+import logging
+
+from pydantic import BaseModel, EmailStr, ValidationError
+
+from algorw.models import Docente, parse_rows
+
+
+# Dirección → valor esperado (None si se debe rechazar).
+CASES = {
+    "docente@fi.uba.ar": "docente@fi.uba.ar",
+    " docente@fi.uba.ar ": "docente@fi.uba.ar",
+    "Docente@FI.UBA.AR": "Docente@fi.uba.ar",
+    "Nombre <docente@fi.uba.ar>": "docente@fi.uba.ar",
+    "a@b.c": "a@b.c",
+    "sin arroba": None,
+    "a@b": None,
+    "a@localhost": None,
+    # Casos que aceptaba la expresión regular [^@\s]+@[^@\s]+\.[^@\s]+.
+    "a..b@fi.uba.ar": None,
+    ".a@fi.uba.ar": None,
+    "a.@fi.uba.ar": None,
+    "a(b)@fi.uba.ar": None,
+    "a,b@fi.uba.ar": None,
+    "a@fi..uba.ar": None,
+    "a@.fi.uba.ar": None,
+    "a@-fi.uba.ar": None,
+    "a@fi_uba.ar": None,
+    "a@fi.uba.ar.": None,
+    "a@fi.uba.123": None,
+}
+
+
+class EmailModel(BaseModel):
+    correo: EmailStr
+
+
+def email_str(value):
+    try:
+        return EmailModel(correo=value).correo
+    except ValidationError:
+        return None
+
+
+def main():
+    logging.disable(logging.WARNING)
+    rows = [list(Docente.COLUMNAS)]
+    rows += [[f"Docente {i}", email, ""] for i, email in enumerate(CASES)]
+    # Cada dirección aparece dos veces, para ejercitar el caché por dirección.
+    parsed = {d.nombre: d.correo for d in parse_rows(rows + rows[1:], Docente)}
+
+    failures = 0
+    for i, (email, expected) in enumerate(CASES.items()):
+        got = parsed.get(f"Docente {i}")
+        reference = email_str(email)
+        ok = got == expected == reference
+        failures += not ok
+        print(f"{'OK   ' if ok else 'FALLA'} {email!r:32} → {got!r}")
+        if reference != expected:
+            print(f"      EmailStr devuelve {reference!r}")
+
+    assert not failures, f"{failures} casos fallaron"
+
+
+if __name__ == "__main__":
+    main()
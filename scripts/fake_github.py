@@ -0,0 +1,290 @@
+"""Imitación local de la API REST de Github, para benchmarks de AluRepo.sync.
+
+Implementa, en memoria, solo los endpoints que usa AluRepo.sync (refs,
+commits, árboles, blobs y check runs), y cuenta las requests y los bytes
+recibidos y enviados. Como Github, responde con ETag y 304 a los GET
+condicionales, e informa el límite de requests en los headers.
+
+Los SHA de los blobs se calculan como en Git, de modo que coinciden con los
+del repositorio de entregas; los de árboles y commits son arbitrarios.
+
+Uso (ver scripts/bench_sync.py):
+
+    fake = FakeGithub("org/repo")
+    fake.seed_branch("main", {"README.md": b"..."})
+    url = fake.start()
+    AluRepo("org/repo", auth_token="x", api_url=url).sync(...)
+    print(fake.stats)
+"""
+
+import base64
+import collections
+import hashlib
+import json
+import re
+import threading
+import time
+
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+
+def git_sha(kind: str, data: bytes) -> str:
+    return hashlib.sha1(b"%s %d\0" % (kind.encode(), len(data)) + data).hexdigest()
+
+
+class FakeGithub:
+    def __init__(self, repo_full: str, default_branch: str = "main"):
+        self.repo_full = repo_full
+        self.default_branch = default_branch
+        self.url = ""
+        self.blobs: Dict[str, bytes] = {}
+        self.trees: Dict[str, Dict[str, Tuple[str, str, str]]] = {}
+        self.commits: Dict[str, Dict] = {}
+        self.refs: Dict[str, str] = {}
+        self.stats: collections.Counter = collections.Counter()
+        self.rate_limit = self.rate_remaining = 5000
+        self.rate_reset = int(time.time()) + 3600
+        self._lock = threading.Lock()
+
+    # Manejo del almacén en memoria.
+
+    def seed_branch(self, branch: str, files: Dict[str, bytes], date=None) -> str:
+        blobs = {path: self._put_blob(data) for path, data in files.items()}
+        tree = self._build_tree({path: ("100644", sha) for path, sha in blobs.items()})
+        date = date or datetime(2020, 1, 1, tzinfo=timezone.utc)
+        commit = self._put_commit("seed", tree, [], date.strftime("%Y-%m-%dT%H:%M:%SZ"))
+        self.refs[branch] = commit
+        return commit
+
+    def files(self, branch: str) -> Dict[str, bytes]:
+        tree = self.commits[self.refs[branch]]["tree"]
+        return {
+            path: self.blobs[sha]
+            for path, (_, kind, sha) in self._flatten(tree).items()
+            if kind == "blob"
+        }
+
+    def _put_blob(self, data: bytes) -> str:
+        sha = git_sha("blob", data)
+        self.blobs[sha] = data
+        return sha
+
+    def _put_commit(self, message, tree, parents, date) -> str:
+        commit = {"message": message, "tree": tree, "parents": parents, "date": date}
+        sha = git_sha("commit", json.dumps(commit, sort_keys=True).encode())
+        self.commits[sha] = commit
+        return sha
+
+    def _build_tree(self, flat: Dict[str, Tuple[str, str]]) -> str:
+        """Construye los árboles a partir de ruta → (modo, sha de blob)."""
+        entries: Dict[str, Tuple[str, str, str]] = {}
+        subdirs: Dict[str, Dict[str, Tuple[str, str]]] = collections.defaultdict(dict)
+        for path, (mode, sha) in flat.items():
+            name, sep, rest = path.partition("/")
+            if sep:
+                subdirs[name][rest] = (mode, sha)
+            else:
+                entries[name] = (mode, "blob", sha)
+        for name, subfiles in subdirs.items():
+            entries[name] = ("040000", "tree", self._build_tree(subfiles))
+        sha = git_sha("tree", json.dumps(sorted(entries.items())).encode())
+        self.trees[sha] = entries
+        return sha
+
+    def _flatten(self, tree: str, prefix="") -> Dict[str, Tuple[str, str, str]]:
+        flat = {}
+        for name, (mode, kind, sha) in self.trees[tree].items():
+            flat[prefix + name] = (mode, kind, sha)
+            if kind == "tree":
+                flat.update(self._flatten(sha, f"{prefix}{name}/"))
+        return flat
+
+    # Servidor HTTP.
+
+    def start(self) -> str:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_PATCH(self):
+                self._dispatch("PATCH")
+
+            def _dispatch(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"null")
+                path, _, query = self.path.partition("?")
+                with fake._lock:
+                    status, result, route = fake.handle(method, path, query, body)
+                    data = json.dumps(result).encode()
+                    etag = f'"{hashlib.sha1(data).hexdigest()}"'
+                    fake.stats["requests"] += 1
+                    fake.stats[f"{method} {route}"] += 1
+                    fake.stats["bytes_in"] += length
+                    if method == "GET" and self.headers.get("If-None-Match") == etag:
+                        # Como en Github, los 304 no cuentan para el límite.
+                        status, data = 304, b""
+                        fake.stats["not_modified"] += 1
+                    else:
+                        fake.rate_remaining -= 1
+                    fake.stats["bytes_out"] += len(data)
+                    remaining = fake.rate_remaining
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("ETag", etag)
+                self.send_header("X-RateLimit-Limit", str(fake.rate_limit))
+                self.send_header("X-RateLimit-Remaining", str(remaining))
+                self.send_header("X-RateLimit-Reset", str(fake.rate_reset))
+                self.send_header("X-RateLimit-Resource", "core")
+                self.end_headers()
+                self.wfile.write(data)
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{server.server_address[1]}"
+        return self.url
+
+    def handle(self, method, path, query, body):
+        prefix = f"/repos/{self.repo_full}"
+        if not path.startswith(prefix):
+            return 404, {"message": "Not Found"}, "?"
+        path = path[len(prefix):]
+        routes = [
+            ("GET", r"", self._get_repo),
+            ("GET", r"/git/refs", self._get_refs),
+            ("GET", r"/git/refs/heads/(.+)", self._get_ref),
+            ("PATCH", r"/git/refs/heads/(.+)", self._edit_ref),
+            ("GET", r"/git/commits/(\w+)", self._get_commit),
+            ("POST", r"/git/commits", self._create_commit),
+            ("GET", r"/git/trees/(\w+)", self._get_tree),
+            ("POST", r"/git/trees", self._create_tree),
+            ("POST", r"/git/blobs", self._create_blob),
+            ("POST", r"/check-runs", self._create_check_run),
+        ]
+        for route_method, pattern, handler in routes:
+            if route_method == method and (m := re.fullmatch(pattern, path)):
+                try:
+                    result = handler(*m.groups(), query=query, body=body)
+                except KeyError:
+                    return 404, {"message": "Not Found"}, pattern
+                return 201 if method == "POST" else 200, result, pattern
+        return 404, {"message": "Not Found"}, "?"
+
+    def _api(self, path=""):
+        return f"{self.url}/repos/{self.repo_full}{path}"
+
+    def _get_repo(self, **_):
+        owner, name = self.repo_full.split("/")
+        return {
+            "id": 1,
+            "name": name,
+            "full_name": self.repo_full,
+            "owner": {"login": owner},
+            "default_branch": self.default_branch,
+            "url": self._api(),
+        }
+
+    def _ref_json(self, branch):
+        sha = self.refs[branch]
+        return {
+            "ref": f"refs/heads/{branch}",
+            "url": self._api(f"/git/refs/heads/{branch}"),
+            "object": {
+                "sha": sha,
+                "type": "commit",
+                "url": self._api(f"/git/commits/{sha}"),
+            },
+        }
+
+    def _get_refs(self, **_):
+        return [self._ref_json(branch) for branch in self.refs]
+
+    def _get_ref(self, branch, **_):
+        return self._ref_json(branch)
+
+    def _edit_ref(self, branch, body, **_):
+        self.refs[branch] = body["sha"]
+        return self._ref_json(branch)
+
+    def _commit_json(self, sha):
+        commit = self.commits[sha]
+        person = {"name": "fake", "email": "fake@example.com", "date": commit["date"]}
+        return {
+            "sha": sha,
+            "url": self._api(f"/git/commits/{sha}"),
+            "message": commit["message"],
+            "author": person,
+            "committer": person,
+            "tree": {
+                "sha": commit["tree"],
+                "url": self._api(f"/git/trees/{commit['tree']}"),
+            },
+            "parents": [
+                {"sha": parent, "url": self._api(f"/git/commits/{parent}")}
+                for parent in commit["parents"]
+            ],
+        }
+
+    def _get_commit(self, sha, **_):
+        return self._commit_json(sha)
+
+    def _create_commit(self, body, **_):
+        date = (body.get("author") or {}).get("date") or "2020-01-01T00:00:00Z"
+        sha = self._put_commit(body["message"], body["tree"], body["parents"], date)
+        return self._commit_json(sha)
+
+    def _tree_json(self, sha, recursive):
+        entries = self._flatten(sha) if recursive else self.trees[sha]
+        return {
+            "sha": sha,
+            "url": self._api(f"/git/trees/{sha}"),
+            "truncated": False,
+            "tree": [
+                {"path": path, "mode": mode, "type": kind, "sha": entry_sha}
+                for path, (mode, kind, entry_sha) in entries.items()
+            ],
+        }
+
+    def _get_tree(self, sha, query, **_):
+        if sha in self.commits:
+            sha = self.commits[sha]["tree"]
+        return self._tree_json(sha, "recursive" in query)
+
+    def _create_tree(self, body, **_):
+        flat = {}
+        if base := body.get("base_tree"):
+            flat = {
+                path: (mode, sha)
+                for path, (mode, kind, sha) in self._flatten(base).items()
+                if kind == "blob"
+            }
+        for elem in body["tree"]:
+            if "content" in elem:
+                sha = self._put_blob(elem["content"].encode())
+                flat[elem["path"]] = (elem["mode"], sha)
+            elif elem.get("sha") is None:
+                flat.pop(elem["path"], None)
+            else:
+                self.blobs[elem["sha"]]  # KeyError → 404, como en Github.
+                flat[elem["path"]] = (elem["mode"], elem["sha"])
+        return self._tree_json(self._build_tree(flat), recursive=False)
+
+    def _create_blob(self, body, **_):
+        data = body["content"].encode()
+        if body.get("encoding") == "base64":
+            data = base64.b64decode(data)
+        sha = self._put_blob(data)
+        return {"sha": sha, "url": self._api(f"/git/blobs/{sha}")}
+
+    def _create_check_run(self, body, **_):
+        return {"id": 1, "name": body.get("name"), "head_sha": body.get("head_sha")}
@@ -0,0 +1,105 @@
+"""Imitación local de las APIs de Sheets y Drive, para benchmarks de PullDB.
+
+Reemplaza a `googleapiclient.discovery` en algorw.sheets, e implementa en
+memoria solo las llamadas que hace PullDB: `spreadsheets().values().batchGet`
+(Sheets v4) y `files().get(fields="modifiedTime")` (Drive v3). Cuenta las
+llamadas a cada una, y las filas descargadas.
+
+Como en Drive, cada modificación de una hoja avanza la fecha de modificación
+de la planilla; touch() la avanza sin cambiar el contenido (lo que ocurre,
+por ejemplo, al cambiar solo el formato de una celda).
+
+Uso (ver scripts/bench_sheets.py):
+
+    fake = FakeSheets("planilla_id", {"Alumnos": [["Padrón", ...], ...]})
+    with fake.patch():
+        PullDB(Config("planilla_id", {}, ["Alumnos"], check_revision=True))
+    print(fake.stats)
+"""
+
+import collections
+import contextlib
+import copy
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List
+from unittest import mock
+
+
+class FakeSheets:
+    def __init__(self, spreadsheet_id: str, sheets: Dict[str, List[List[str]]]):
+        self.spreadsheet_id = spreadsheet_id
+        self.sheets = copy.deepcopy(sheets)
+        self.modified = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        self.stats: collections.Counter = collections.Counter()
+
+    # Modificación de la planilla.
+
+    def update(self, sheet: str, rows: List[List[str]]) -> None:
+        self.sheets[sheet] = copy.deepcopy(rows)
+        self.touch()
+
+    def touch(self) -> None:
+        self.modified += timedelta(seconds=1)
+
+    @property
+    def modified_time(self) -> str:
+        return self.modified.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+    # Reemplazo de googleapiclient.discovery.
+
+    @contextlib.contextmanager
+    def patch(self) -> Iterator["FakeSheets"]:
+        with mock.patch("algorw.sheets.discovery", self):
+            yield self
+
+    def build(self, service: str, version: str, *, credentials=None):
+        assert (service, version) in {("sheets", "v4"), ("drive", "v3")}, service
+        return _Resource(self)
+
+    def batch_get(self, spreadsheetId, ranges, **_):
+        assert spreadsheetId == self.spreadsheet_id, spreadsheetId
+        self.stats["batchGet"] += 1
+        value_ranges = []
+        for sheet in ranges:
+            rows = copy.deepcopy(self.sheets[sheet])
+            self.stats["rows"] += len(rows)
+            value_ranges.append({"range": f"{sheet}!A1:Z{len(rows)}", "values": rows})
+        return {"spreadsheetId": spreadsheetId, "valueRanges": value_ranges}
+
+    def get_file(self, fileId, fields, **_):
+        assert fileId == self.spreadsheet_id, fileId
+        assert fields == "modifiedTime", fields
+        self.stats["files.get"] += 1
+        return {"modifiedTime": self.modified_time}
+
+
+class _Resource:
+    """Recurso de la API: los métodos devuelven queries a ejecutar."""
+
+    def __init__(self, fake: FakeSheets):
+        self._fake = fake
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def files(self):
+        return self
+
+    def batchGet(self, **kwargs):
+        return _Query(self._fake.batch_get, kwargs)
+
+    def get(self, **kwargs):
+        return _Query(self._fake.get_file, kwargs)
+
+
+class _Query:
+    def __init__(self, func, kwargs):
+        self._func = func
+        self._kwargs = kwargs
+
+    def execute(self):
+        return self._func(**self._kwargs)
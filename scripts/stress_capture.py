@@ -0,0 +1,144 @@
+"""Prueba de run_captured() con workers que se portan mal.
+
+Corre, con un tiempo límite de TIMEOUT segundos, workers falsos que:
+
+  - inundan la salida (con y sin terminar antes del tiempo límite);
+  - se cuelgan, con y sin leer su entrada estándar;
+  - dejan un proceso en segundo plano con la salida abierta;
+  - terminan con un código de error;
+
+y verifica que la salida guardada queda acotada, que los tiempos límite se
+respetan, y que no sobrevive ningún proceso de la entrega.
+
+Ejecutar desde la raíz del repositorio:
+
+    python -m scripts.stress_capture [TIMEOUT]
+"""
+
+import os
+import sys
+import time
+
+from algorw.corrector.capture import MAX_HEAD, MAX_TAIL, OMITTED_MARK, run_captured
+
+
+# Tamaño máximo de la salida guardada (cabeza, cola y marca de omisión).
+MAX_OUTPUT = MAX_HEAD + MAX_TAIL + len(OMITTED_MARK) + 20
+
+# Entrada (simulando el TAR de la entrega) que se escribe a cada worker.
+PAYLOAD = b"\0" * (4 * 1024 * 1024)
+
+
+def feed(stdin):
+    stdin.write(PAYLOAD)
+
+
+def alive(pid: int) -> bool:
+    """Si el proceso existe y no es un zombie."""
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            return stat.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def check(name, script, timeout, *, timed_out, retcode=None, omitted, max_time):
+    start = time.perf_counter()
+    result = run_captured(["sh", "-c", script], feed, timeout=timeout)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{name:<28} tiempo={elapsed:5.1f} s retcode={result.retcode:<4} "
+        f"timeout={result.timed_out!s:<5} salida={len(result.output):>7} "
+        f"omitidos={result.omitted}"
+    )
+    assert result.timed_out == timed_out, name
+    assert retcode is None or result.retcode == retcode, name
+    assert (result.omitted > 0) == omitted, name
+    assert len(result.output) <= MAX_OUTPUT, name
+    assert elapsed <= max_time, f"{name}: tardó {elapsed:.1f} s"
+    return result
+
+
+def main(timeout):
+    slack = timeout + 5
+
+    check(
+        "inundación (termina)",
+        "cat >/dev/null; head -c 50000000 /dev/zero | tr '\\0' x",
+        timeout,
+        timed_out=False,
+        retcode=0,
+        omitted=True,
+        max_time=slack,
+    )
+    check(
+        "inundación (no termina)",
+        "cat >/dev/null; yes 'Todo OK'",
+        timeout,
+        timed_out=True,
+        omitted=True,
+        max_time=slack,
+    )
+    check(
+        "colgado",
+        "cat >/dev/null; echo empezando; sleep 1000",
+        timeout,
+        timed_out=True,
+        omitted=False,
+        max_time=slack,
+    )
+    check(
+        "colgado sin leer la entrada",
+        "sleep 1000",
+        timeout,
+        timed_out=True,
+        omitted=False,
+        max_time=slack,
+    )
+
+    # El proceso principal termina enseguida, pero deja un hijo con stdout
+    # abierto: no se debe esperar al hijo, y el hijo no debe sobrevivir.
+    result = check(
+        "hijo en segundo plano",
+        "cat >/dev/null; sleep 1000 & echo $!; echo Todo OK",
+        timeout,
+        timed_out=False,
+        retcode=0,
+        omitted=False,
+        max_time=timeout / 2,
+    )
+    child = int(result.output.split()[0])
+    time.sleep(0.1)
+    assert not alive(child), f"el proceso {child} sobrevivió"
+
+    check(
+        "código de error",
+        "cat >/dev/null; echo ERROR; exit 3",
+        timeout,
+        timed_out=False,
+        retcode=3,
+        omitted=False,
+        max_time=slack,
+    )
+
+    # Ningún sleep de los workers anteriores debe seguir corriendo.
+    leftover = [
+        pid
+        for pid in os.listdir("/proc")
+        if pid.isdigit() and alive(int(pid)) and _cmdline(pid) == b"sleep\x001000\x00"
+    ]
+    assert not leftover, f"procesos sobrevivientes: {leftover}"
+    print("sin procesos sobrevivientes: OK")
+
+
+def _cmdline(pid: str) -> bytes:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as cmdline:
+            return cmdline.read()
+    except OSError:
+        return b""
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,135 @@
+"""Prueba de estrés de Moss con varios procesos guardando entregas a la vez.
+
+Lanza PROCESOS procesos que guardan, cada uno, ENTREGAS entregas en el mismo
+repositorio (como varios workers de rq). Cada proceso escribe siempre en sus
+propios padrones, pero todos comparten los directorios de cada TP, por lo que
+Moss.flush() debe reintentar cuando otro proceso actualiza HEAD. El
+repositorio empieza vacío, así que también compiten por crear el primer
+commit.
+
+Al terminar verifica que:
+
+  - `git fsck` no reporta errores (sí quedan commits sueltos, de los
+    reintentos de flush());
+  - hay exactamente un commit por entrega;
+  - HEAD tiene la última versión de cada entrega;
+  - tras actualizar el índice como lo hace el pusher (`git read-tree -m`),
+    `git status` no muestra cambios.
+
+Ejecutar desde la raíz del repositorio:
+
+    python -m scripts.stress_moss [PROCESOS] [ENTREGAS]
+"""
+
+import multiprocessing
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+from pathlib import PurePath
+
+from algorw.corrector.moss import Moss
+
+
+GIT_ENV = {
+    **os.environ,
+    "GIT_AUTHOR_NAME": "stress",
+    "GIT_AUTHOR_EMAIL": "stress@example.com",
+    "GIT_COMMITTER_NAME": "stress",
+    "GIT_COMMITTER_EMAIL": "stress@example.com",
+}
+
+# Padrones por proceso: cada uno se re-entrega varias veces.
+PADRONES = 5
+
+
+def git(root, *args):
+    return subprocess.run(
+        ["git", *args], cwd=root, env=GIT_ENV, check=True, capture_output=True
+    ).stdout.decode()
+
+
+def relpath(proc: int, i: int) -> PurePath:
+    return PurePath(f"tp{i % 3}") / "2020_1" / f"{100000 + proc * 100 + i % PADRONES}"
+
+
+def contents(proc: int, i: int) -> bytes:
+    return b"/* proceso %d, entrega %d */\n" % (proc, i) + b"int x;\n" * 100
+
+
+def submit(root: pathlib.Path, proc: int, entregas: int) -> None:
+    os.environ.update(GIT_ENV)
+    for i in range(entregas):
+        moss = Moss(root, relpath(proc, i), "https://github.com/stress/entregas")
+        moss.save_data("tp.c", contents(proc, i))
+        moss.save_output("Todo OK\n")
+        moss.commit_emoji("Todo OK\n")
+        moss.flush(f"New upload {proc}/{i}", "2020-01-02T00:00:00")
+
+
+def expected(procs: int, entregas: int):
+    """Última versión de cada entrega (ruta → contenido)."""
+    latest = {}
+    for proc in range(procs):
+        for i in range(entregas):
+            latest[relpath(proc, i) / "tp.c"] = contents(proc, i)
+    return latest
+
+
+def main(procs, entregas):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = pathlib.Path(tmpdir)
+        git(root, "init", "-q")
+
+        workers = [
+            multiprocessing.Process(target=submit, args=(root, proc, entregas))
+            for proc in range(procs)
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        total = procs * entregas
+        print(f"{total} entregas en {elapsed:.1f} s ({total / elapsed:.1f}/s)")
+        assert all(w.exitcode == 0 for w in workers), "algún proceso falló"
+
+        # Los reintentos de flush() dejan commits sueltos, que gc eliminará.
+        fsck = subprocess.run(
+            ["git", "fsck", "--strict", "--no-progress", "--no-dangling"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+        )
+        assert fsck.returncode == 0 and not fsck.stdout, fsck.stdout + fsck.stderr
+        print("fsck: OK")
+
+        commits = int(git(root, "rev-list", "--count", "HEAD"))
+        assert commits == total, f"se esperaban {total} commits, hay {commits}"
+        print(f"commits: {commits} (OK)")
+
+        for path, data in expected(procs, entregas).items():
+            blob = subprocess.run(
+                ["git", "cat-file", "blob", f"HEAD:{path.as_posix()}"],
+                cwd=root,
+                check=True,
+                capture_output=True,
+            ).stdout
+            assert blob == data, f"{path}: contenido inesperado en HEAD"
+        print("HEAD tiene la última versión de cada entrega: OK")
+
+        git(root, "read-tree", "-m", "HEAD")
+        status = git(root, "status", "--porcelain")
+        assert not status, status
+        print("git status tras read-tree: limpio (OK)")
+
+
+if __name__ == "__main__":
+    procs = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    entregas = int(sys.argv[2]) if len(sys.argv) > 2 else 80
+    main(procs, entregas)